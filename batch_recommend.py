@@ -0,0 +1,229 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from recommender import MovieRecommender
+
+logger = logging.getLogger(__name__)
+
+# Recommender loaded once per worker process; the artifact is memory-mapped,
+# so workers share its pages
+_worker_recommender = None
+
+
+def _init_worker(artifact_dir):
+    global _worker_recommender
+    _worker_recommender = MovieRecommender.load(artifact_dir)
+
+
+def _shard_path(output_dir, shard, output_format):
+    return os.path.join(output_dir, f'shard-{shard:05d}.{output_format}')
+
+
+def write_shard(recommender, rows, n, output_dir, shard, output_format='jsonl', block_size=1024):
+    """
+    Compute recommendations for a set of rows and write them as one shard
+
+    Rows are scored in vectorized blocks. The shard is written to a
+    temporary file and renamed into place, so a shard file on disk is
+    always complete.
+
+    Args:
+        recommender (MovieRecommender): Fitted recommender
+        rows (np.ndarray): Row positions of the query movies
+        n (int): Recommendations per movie
+        output_dir (str): Directory for shard files
+        shard (int): Shard number
+        output_format (str): 'jsonl' or 'parquet'
+        block_size (int): Rows scored at once
+
+    Returns:
+        int: Number of movies written
+    """
+    df = recommender.df
+    ids = df['id'].to_numpy() if 'id' in df.columns else np.arange(len(df))
+    titles = df['title'].to_numpy()
+
+    records = []
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        indices, scores = recommender.similar_rows(block, n)
+        for row, neighbor_rows, neighbor_scores in zip(block, indices, scores):
+            found = neighbor_rows >= 0
+            records.append({
+                'id': ids[row].item(),
+                'title': titles[row],
+                'recommended_ids': ids[neighbor_rows[found]].tolist(),
+                'recommended_titles': titles[neighbor_rows[found]].tolist(),
+                'scores': np.round(neighbor_scores[found].astype(np.float64), 6).tolist()
+            })
+
+    path = _shard_path(output_dir, shard, output_format)
+    tmp_path = f'{path}.tmp'
+    if output_format == 'jsonl':
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write('\n')
+    elif output_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.Table.from_pylist(records), tmp_path)
+    else:
+        raise ValueError(f"Unknown output format: {output_format}")
+    os.replace(tmp_path, path)
+
+    return len(records)
+
+
+def _write_shard_in_worker(rows, n, output_dir, shard, output_format, block_size):
+    return shard, write_shard(_worker_recommender, rows, n, output_dir, shard,
+                              output_format, block_size)
+
+
+def run_batch(artifact_dir, output_dir, n=10, movie_ids=None, shard_size=10000,
+              n_workers=1, output_format='jsonl', block_size=1024):
+    """
+    Precompute recommendations for the catalog and stream them to shards
+
+    Shards that already exist in output_dir are skipped, so rerunning the
+    same job after an interruption resumes where it stopped. A plan file
+    records the job parameters, the model and the catalog version, and
+    guards against resuming a different job or against a changed artifact.
+
+    Args:
+        artifact_dir (str): Saved model artifact, see MovieRecommender.save
+        output_dir (str): Directory for shard files
+        n (int): Recommendations per movie
+        movie_ids (list, optional): TMDB ids to process; all movies if omitted
+        shard_size (int): Movies per shard file
+        n_workers (int): Worker processes
+        output_format (str): 'jsonl' or 'parquet'
+        block_size (int): Rows scored at once inside a shard
+
+    Returns:
+        dict: Summary with movie, shard and throughput counts
+    """
+    recommender = MovieRecommender.load(artifact_dir)
+    if movie_ids is None:
+        rows = np.arange(len(recommender.df))
+    else:
+        lookups = [recommender.title_index.lookup_id(movie_id) for movie_id in movie_ids]
+        missing = [movie_id for movie_id, row in zip(movie_ids, lookups) if row is None]
+        if missing:
+            logger.warning(f"Skipping {len(missing)} unknown movie ids")
+        rows = np.array([row for row in lookups if row is not None], dtype=np.int64)
+
+    os.makedirs(output_dir, exist_ok=True)
+    # The model and catalog are part of the plan, so shards from a rebuilt
+    # or updated artifact are never mixed with older ones
+    manifest = MovieRecommender.read_manifest(artifact_dir)
+    plan = {
+        'fingerprint': manifest.get('fingerprint'),
+        'artifact_version': manifest.get('version'),
+        'model_id': recommender.model_id,
+        'data_version': MovieRecommender.manifest_data_version(manifest),
+        'model_params': recommender.model_params,
+        'rows': hashlib.sha256(rows.tobytes()).hexdigest(),
+        'n': n,
+        'shard_size': shard_size,
+        'format': output_format
+    }
+    plan_path = os.path.join(output_dir, 'plan.json')
+    if os.path.exists(plan_path):
+        with open(plan_path) as f:
+            if json.load(f) != plan:
+                raise ValueError(f"{output_dir} holds shards from a different batch job")
+    else:
+        with open(plan_path, 'w') as f:
+            json.dump(plan, f, indent=2)
+
+    shards = [
+        (shard, rows[start:start + shard_size])
+        for shard, start in enumerate(range(0, len(rows), shard_size))
+    ]
+    pending = [
+        (shard, shard_rows) for shard, shard_rows in shards
+        if not os.path.exists(_shard_path(output_dir, shard, output_format))
+    ]
+    logger.info(
+        f"{len(rows)} movies in {len(shards)} shards, "
+        f"{len(shards) - len(pending)} already done"
+    )
+
+    total = sum(len(shard_rows) for _, shard_rows in pending)
+    done = 0
+    start_time = time.perf_counter()
+
+    def report(shard, count):
+        nonlocal done
+        done += count
+        elapsed = time.perf_counter() - start_time
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / rate if rate > 0 else 0.0
+        logger.info(
+            f"Shard {shard} written: {done}/{total} movies, "
+            f"{rate:,.0f} movies/s, ETA {eta:,.0f}s"
+        )
+
+    if n_workers <= 1:
+        for shard, shard_rows in pending:
+            report(shard, write_shard(recommender, shard_rows, n, output_dir, shard,
+                                      output_format, block_size))
+    else:
+        del recommender
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(artifact_dir,)) as executor:
+            futures = [
+                executor.submit(_write_shard_in_worker, shard_rows, n, output_dir, shard,
+                                output_format, block_size)
+                for shard, shard_rows in pending
+            ]
+            for future in as_completed(futures):
+                report(*future.result())
+
+    elapsed = time.perf_counter() - start_time
+    return {
+        'movies': int(len(rows)),
+        'shards': len(shards),
+        'shards_written': len(pending),
+        'seconds': elapsed,
+        'movies_per_second': done / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute similar movies for the whole catalog")
+    parser.add_argument('--artifact-dir', default='Outputs/model')
+    parser.add_argument('--output-dir', default='Outputs/recommendations')
+    parser.add_argument('--n', type=int, default=10, help="Recommendations per movie")
+    parser.add_argument('--ids-file', help="File with one TMDB id per line; defaults to all movies")
+    parser.add_argument('--shard-size', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+
+    movie_ids = None
+    if args.ids_file:
+        with open(args.ids_file) as f:
+            movie_ids = [int(line) for line in f if line.strip()]
+
+    summary = run_batch(args.artifact_dir, args.output_dir, n=args.n, movie_ids=movie_ids,
+                        shard_size=args.shard_size, n_workers=args.workers,
+                        output_format=args.format)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
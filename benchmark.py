@@ -0,0 +1,376 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from data_loader import MovieDataLoader
+from feature_engineering import FeatureEngineer
+from instrumentation import peak_rss_mb, reset_peak_rss
+from recommender import MovieRecommender
+
+logger = logging.getLogger(__name__)
+
+GENRES = ['Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary', 'Drama', 'Family',
+          'Fantasy', 'History', 'Horror', 'Music', 'Mystery', 'Romance', 'Science Fiction',
+          'TV Movie', 'Thriller', 'War', 'Western', 'Foreign']
+LANGUAGES = ['en', 'fr', 'es', 'de', 'ja', 'it', 'zh', 'ko', 'hi', 'ru']
+LANGUAGE_SHARES = [0.7, 0.06, 0.05, 0.04, 0.04, 0.03, 0.03, 0.02, 0.02, 0.01]
+CREW_JOBS = ['Director', 'Producer', 'Screenplay', 'Editor', 'Original Music Composer']
+
+# Timings and memory peaks that grow by more than this fraction over the
+# baseline are flagged
+REGRESSION_TOLERANCE = 0.2
+
+# Run settings a baseline must share to be comparable; tracemalloc slows
+# every stage down, so traced and untraced runs are not compared
+CONFIG_KEYS = ('n_movies', 'mode', 'backend', 'k', 'chunksize', 'n_workers', 'seed', 'trace_memory')
+
+
+def generate_catalog(n_movies, path, seed=0, chunk_size=50000):
+    """
+    Write a synthetic catalog with the columns and encodings of the TMDB CSV
+
+    Overview words and people are drawn from Zipf distributions, so common
+    terms and prolific actors recur the way they do in real data. Nested
+    columns are JSON strings of dicts, as in the TMDB export.
+
+    Args:
+        n_movies (int): Number of movies
+        path (str): Destination CSV path
+        seed (int): Random seed; the same seed always gives the same file
+        chunk_size (int): Rows generated and written at once
+
+    Returns:
+        str: The path written
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f'w{i}' for i in range(max(2000, n_movies // 10))])
+    people = np.array([f'Person {i}' for i in range(max(500, n_movies // 4))])
+
+    def zipf(size, n):
+        return np.minimum(rng.zipf(1.3, size=size), n) - 1
+
+    def words(counts):
+        drawn = vocabulary[zipf(counts.sum(), len(vocabulary))]
+        return [' '.join(part) for part in np.split(drawn, np.cumsum(counts)[:-1])]
+
+    def named_lists(counts, names, template, skewed=False):
+        picks = zipf(counts.sum(), len(names)) if skewed else rng.integers(0, len(names), counts.sum())
+        chosen = names[picks]
+        parts = np.split(chosen, np.cumsum(counts)[:-1])
+        return ['[' + ', '.join(template(i, name) for i, name in enumerate(part)) + ']' for part in parts]
+
+    for start in range(0, n_movies, chunk_size):
+        size = min(chunk_size, n_movies - start)
+        ids = np.arange(start, start + size) + 100000
+        budget = np.where(rng.random(size) < 0.3, 0, rng.lognormal(16, 1.5, size).astype(np.int64))
+        revenue = np.where(rng.random(size) < 0.35, 0, (budget * rng.lognormal(0.8, 1.0, size)).astype(np.int64))
+        dates = pd.Timestamp('1920-01-01') + pd.to_timedelta(rng.integers(0, 35000, size), unit='D')
+        overview = words(rng.integers(10, 60, size))
+
+        chunk = pd.DataFrame({
+            'budget': budget,
+            'genres': named_lists(rng.integers(0, 4, size), np.array(GENRES),
+                                  lambda i, name: f'{{"id": {GENRES.index(name)}, "name": "{name}"}}'),
+            'homepage': np.where(rng.random(size) < 0.6, None, 'http://www.example.com/'),
+            'id': ids,
+            'keywords': named_lists(rng.integers(0, 8, size), vocabulary,
+                                    lambda i, name: f'{{"id": {i}, "name": "{name}"}}'),
+            'original_language': rng.choice(LANGUAGES, size, p=LANGUAGE_SHARES),
+            'original_title': [f'Movie {i}' for i in ids],
+            'overview': np.where(rng.random(size) < 0.01, None, np.array(overview, dtype=object)),
+            'popularity': rng.lognormal(1.5, 1.2, size).round(6),
+            'release_date': np.where(rng.random(size) < 0.01, None, dates.strftime('%Y-%m-%d').to_numpy()),
+            'revenue': revenue,
+            'runtime': np.where(rng.random(size) < 0.02, np.nan, rng.normal(105, 20, size).round().clip(3, 300)),
+            'status': rng.choice(['Released', 'Post Production', 'Rumored'], size, p=[0.98, 0.01, 0.01]),
+            'tagline': np.where(rng.random(size) < 0.3, None, np.array(words(rng.integers(3, 10, size)),
+                                                                         dtype=object)),
+            # About 1% of titles repeat an earlier one, like remakes
+            'title': [f'Movie {i if r > 0.01 else max(100000, i - 1000)}'
+                      for i, r in zip(ids, rng.random(size))],
+            'vote_average': rng.normal(6.2, 1.0, size).clip(0, 10).round(1),
+            'vote_count': rng.zipf(1.5, size).clip(0, 15000),
+            'cast': named_lists(rng.integers(0, 12, size), people,
+                                lambda i, name: f'{{"cast_id": {i}, "character": "", "name": "{name}", '
+                                                f'"order": {i}}}', skewed=True),
+            'crew': named_lists(rng.integers(1, 6, size), people,
+                                lambda i, name: f'{{"department": "", "job": "{CREW_JOBS[i % 5]}", '
+                                                f'"name": "{name}"}}', skewed=True)
+        })
+        chunk.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+
+    return path
+
+
+class BenchmarkRun:
+    """Collects per-stage wall time and peak memory"""
+
+    def __init__(self, trace_memory=False):
+        """
+        Args:
+            trace_memory (bool): Record each stage's peak Python allocation
+                with tracemalloc; more precise than peak RSS, but slows the
+                timed code down
+        """
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        gc.collect()
+        # Where the OS allows it, the RSS high-water mark restarts at each
+        # stage; otherwise it is the process peak so far and not compared
+        per_stage = reset_peak_rss()
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            result = {'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb(),
+                      'peak_rss_scope': 'stage' if per_stage else 'process'}
+            if self.trace_memory:
+                result['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+            self.stages[name] = result
+            logger.info(f"{name}: {result['seconds']:.3f}s")
+
+
+def benchmark_queries(recommender, n_queries=1000, n=10, batch_size=256, seed=0):
+    """
+    Measure single-query latency and batched throughput
+
+    Args:
+        recommender (MovieRecommender): Fitted recommender
+        n_queries (int): Titles sampled from the catalog
+        n (int): Recommendations per query
+        batch_size (int): Titles per get_recommendations_batch call
+        seed (int): Sampling seed
+
+    Returns:
+        dict: Latency percentiles in ms and queries per second
+    """
+    rng = np.random.default_rng(seed)
+    titles = recommender.df['title'].to_numpy()[
+        rng.integers(0, len(recommender.df), n_queries)
+    ].tolist()
+
+    latencies = np.empty(len(titles))
+    for i, title in enumerate(titles):
+        start = time.perf_counter()
+        recommender.get_recommendations(title, n=n)
+        latencies[i] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for offset in range(0, len(titles), batch_size):
+        recommender.get_recommendations_batch(titles[offset:offset + batch_size], n=n)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        'queries': len(titles),
+        'n': n,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+        'single_qps': float(len(titles) / (latencies.sum() / 1000)),
+        'batch_qps': float(len(titles) / batch_seconds) if batch_seconds > 0 else None
+    }
+
+
+def run_benchmark(n_movies, mode='neighbors', backend='exact', k=50, n_queries=1000, chunksize=None,
+                  n_workers=None, trace_memory=False, workdir=None, seed=0):
+    """
+    Time the full pipeline on a synthetic catalog
+
+    Stages: generate, load, the three FeatureEngineer steps, model build,
+    then query latency and throughput.
+
+    Args:
+        n_movies (int): Catalog size
+        mode (str): Model mode, see build_content_based_model
+        backend (str): Similarity backend name
+        k (int): Neighbors kept per movie in 'neighbors' mode
+        n_queries (int): Queries for the latency benchmark
+        chunksize (int, optional): Chunked loading, see MovieDataLoader.load_data
+        n_workers (int, optional): Worker processes for chunked loading
+        trace_memory (bool): Also record tracemalloc peaks per stage
+        workdir (str, optional): Where the catalog CSV is written; a
+            temporary directory by default
+        seed (int): Generator and sampling seed
+
+    Returns:
+        dict: JSON-ready results
+    """
+    run = BenchmarkRun(trace_memory=trace_memory)
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        path = os.path.join(tmp, 'movies.csv')
+        with run.stage('generate'):
+            generate_catalog(n_movies, path, seed=seed)
+
+        with run.stage('load'):
+            df = MovieDataLoader(path, log_level=logging.WARNING).load_data(chunksize=chunksize,
+                                                                             n_workers=n_workers)
+
+    engineer = FeatureEngineer(df)
+    with run.stage('combined_features'):
+        engineer.create_combined_features()
+    with run.stage('encode_categorical'):
+        engineer.encode_categorical_features()
+    with run.stage('normalize_numeric'):
+        df = engineer.normalize_numeric_features()
+
+    recommender = MovieRecommender(df)
+    with run.stage('build_model'):
+        recommender.build_content_based_model(mode=mode, k=k, backend=backend)
+
+    with run.stage('queries'):
+        queries = benchmark_queries(recommender, n_queries=n_queries, seed=seed)
+
+    return {
+        'meta': {
+            'n_movies': n_movies,
+            'mode': mode,
+            'backend': backend,
+            'k': k,
+            'chunksize': chunksize,
+            'n_workers': n_workers,
+            'seed': seed,
+            'trace_memory': trace_memory,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'stages': run.stages,
+        'queries': queries
+    }
+
+
+def run_config(results):
+    """The settings of a run that a comparable baseline must share"""
+    return {key: results['meta'].get(key) for key in CONFIG_KEYS}
+
+
+def compare_to_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Flag stages and query metrics that got slower or used more memory
+    than a stored baseline
+
+    Per-stage memory is compared when both runs recorded it: peak RSS
+    measured per stage, and tracemalloc peaks from --trace-memory.
+
+    Args:
+        results (dict): Output of run_benchmark
+        baseline (dict): Earlier output of run_benchmark with the same
+            run_config
+        tolerance (float): Allowed growth as a fraction, e.g. 0.2 = 20%
+
+    Returns:
+        list: One dict per regression with metric, baseline, current and
+            ratio
+
+    Raises:
+        ValueError: If the runs' configs differ
+    """
+    if run_config(results) != run_config(baseline):
+        raise ValueError(f"Baseline config {run_config(baseline)} does not match {run_config(results)}")
+
+    pairs = []
+    for name, stage in results['stages'].items():
+        previous = baseline['stages'].get(name, {})
+        pairs.append((f'stages.{name}.seconds', stage['seconds'], previous.get('seconds')))
+        if stage.get('peak_rss_scope') == 'stage' and previous.get('peak_rss_scope') == 'stage':
+            pairs.append((f'stages.{name}.peak_rss_mb', stage['peak_rss_mb'], previous.get('peak_rss_mb')))
+        if stage.get('peak_traced_mb') is not None:
+            pairs.append((f'stages.{name}.peak_traced_mb', stage['peak_traced_mb'],
+                          previous.get('peak_traced_mb')))
+    pairs += [(f'queries.{metric}', results['queries'][metric], baseline['queries'].get(metric))
+              for metric in ('p50_ms', 'p95_ms', 'p99_ms')]
+    # Throughput regresses when it drops, so compare its inverse
+    pairs += [(f'queries.{metric}', 1 / results['queries'][metric], 1 / baseline['queries'][metric])
+              for metric in ('single_qps', 'batch_qps')
+              if results['queries'].get(metric) and baseline['queries'].get(metric)]
+
+    regressions = []
+    for metric, current, previous in pairs:
+        if previous and current is not None and current > previous * (1 + tolerance):
+            regressions.append({'metric': metric, 'baseline': previous, 'current': current,
+                                'ratio': current / previous})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation pipeline on synthetic data")
+    parser.add_argument('--movies', type=int, nargs='+', default=[5000],
+                        help="Catalog sizes to run, e.g. 5000 100000 1000000")
+    parser.add_argument('--mode', default='neighbors', choices=['dense', 'neighbors', 'backend'])
+    parser.add_argument('--backend', default='exact', choices=['exact', 'approximate'])
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--chunksize', type=int, help="Load the CSV in chunks across worker processes")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--trace-memory', action='store_true', help="Record tracemalloc peaks per stage")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--baseline', help="Earlier results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+
+    runs = [
+        run_benchmark(n_movies, mode=args.mode, backend=args.backend, k=args.k, n_queries=args.queries,
+                      chunksize=args.chunksize, n_workers=args.workers, trace_memory=args.trace_memory,
+                      seed=args.seed)
+        for n_movies in args.movies
+    ]
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline_runs = json.load(f)['runs']
+        for run in runs:
+            baseline = next((previous for previous in baseline_runs
+                             if run_config(previous) == run_config(run)), None)
+            if baseline is None:
+                logger.warning(f"No baseline with the same config: {run_config(run)}")
+                continue
+            run['regressions'] = compare_to_baseline(run, baseline, args.tolerance)
+            regressions += run['regressions']
+
+    report = json.dumps({'runs': runs}, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            f.write(report)
+    print(report)
+
+    for regression in regressions:
+        logger.warning(
+            f"Regression in {regression['metric']}: {regression['baseline']:.4g} -> "
+            f"{regression['current']:.4g} ({regression['ratio']:.2f}x)"
+        )
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from feature_engineering import genre_bitmask
+
+# Numeric columns filtered by an inclusive (low, high) range
+RANGE_FILTERS = ('release_year', 'runtime', 'vote_count')
+
+# Text columns filtered by membership in a set of values
+VALUE_FILTERS = ('original_language',)
+
+
+class CatalogFilter:
+    """
+    Boolean row masks for structured filters over the catalog
+
+    Supported filters, all optional and combined with AND:
+
+        release_year, runtime, vote_count: (low, high) inclusive range,
+            either end None for open; a bare number means (number, None)
+        original_language: one code or a list of codes, e.g. ['en', 'fr']
+        genres: list of genre names, a movie must have at least one
+
+    Filter columns are converted to arrays once; genres become bitmasks
+    and languages integer codes. Masks of recently used filters are kept,
+    so repeating a filter costs a dictionary lookup.
+    """
+
+    def __init__(self, df, max_cached_masks=64):
+        """
+        Args:
+            df (pd.DataFrame): Movie catalog
+            max_cached_masks (int): Distinct filters whose masks are kept
+        """
+        self.n_rows = len(df)
+        self.ranges = {
+            column: df[column].to_numpy(dtype=np.float64)
+            for column in RANGE_FILTERS if column in df.columns
+        }
+        self.codes = {}
+        self.categories = {}
+        for column in VALUE_FILTERS:
+            if column in df.columns:
+                values = pd.Categorical(df[column].astype(object))
+                self.codes[column] = values.codes
+                self.categories[column] = {value: code for code, value in enumerate(values.categories)}
+
+        genre_classes = sorted({genre for genres in df['genre_names'] for genre in genres})[:64]
+        self.genre_bits = {genre: bit for bit, genre in enumerate(genre_classes)}
+        self.genre_masks = genre_bitmask(df['genre_names'], genre_classes)
+
+        self.max_cached_masks = max_cached_masks
+        self._masks = OrderedDict()
+
+    @staticmethod
+    def normalize(filters):
+        """
+        Canonical, hashable form of a filter dict
+
+        Args:
+            filters (dict or None): Filters as described on the class
+
+        Returns:
+            tuple: Sorted (name, value) pairs, or None for no filters
+
+        Raises:
+            ValueError: If filters is not a dict, or names an unknown filter
+        """
+        if filters is None:
+            return None
+        if not isinstance(filters, dict):
+            raise ValueError(f"Filters must be a mapping of filter names to values, got {filters!r}")
+        normalized = []
+        for name, value in filters.items():
+            if value is None:
+                continue
+            if name in RANGE_FILTERS:
+                low, high = (value, None) if np.isscalar(value) else value
+                value = (None if low is None else float(low), None if high is None else float(high))
+            elif name in VALUE_FILTERS or name == 'genres':
+                value = (value,) if isinstance(value, str) else tuple(sorted(value))
+            else:
+                raise ValueError(f"Unknown filter: {name}")
+            normalized.append((name, value))
+        return tuple(sorted(normalized)) or None
+
+    def mask(self, filters):
+        """
+        Rows passing a set of filters
+
+        Args:
+            filters (dict or tuple): Filters, raw or from normalize()
+
+        Returns:
+            np.ndarray: Read-only boolean mask over catalog rows, or None
+                when nothing is filtered
+        """
+        key = filters if isinstance(filters, tuple) or filters is None else self.normalize(filters)
+        if key is None:
+            return None
+        if key in self._masks:
+            self._masks.move_to_end(key)
+            return self._masks[key]
+
+        mask = np.ones(self.n_rows, dtype=bool)
+        for name, value in key:
+            if name in RANGE_FILTERS:
+                column = self._column(self.ranges, name)
+                low, high = value
+                # Movies with unknown values never match a range
+                if low is not None:
+                    mask &= column >= low
+                if high is not None:
+                    mask &= column <= high
+                if low is None and high is None:
+                    mask &= ~np.isnan(column)
+            elif name in VALUE_FILTERS:
+                codes = self._column(self.codes, name)
+                wanted = [self.categories[name][v] for v in value if v in self.categories[name]]
+                mask &= np.isin(codes, wanted)
+            else:
+                bits = [self.genre_bits[genre] for genre in value if genre in self.genre_bits]
+                wanted = self.genre_masks.dtype.type(sum(1 << bit for bit in bits))
+                mask &= (self.genre_masks & wanted) != 0
+
+        mask.flags.writeable = False
+        self._masks[key] = mask
+        if len(self._masks) > self.max_cached_masks:
+            self._masks.popitem(last=False)
+        return mask
+
+    @staticmethod
+    def _column(columns, name):
+        if name not in columns:
+            raise ValueError(f"Catalog has no '{name}' column to filter on")
+        return columns[name]
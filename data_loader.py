@@ -3,17 +3,65 @@ import numpy as np
 from ast import literal_eval
 import json
 import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from instrumentation import INSTRUMENTATION
+
+try:
+    # orjson is several times faster than the standard library decoder
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Nested columns parsed from JSON strings
+NESTED_COLUMNS = ['genres', 'keywords', 'cast', 'crew']
+
+# Low-cardinality string columns stored dictionary-encoded in the cache
+CATEGORICAL_COLUMNS = ['original_language', 'status', 'director']
+
+# Hash of each raw CSV row, used to detect changed rows on refresh
+SOURCE_HASH_COLUMN = '_source_hash'
+
+# Raw columns each derived field is computed from
+DERIVED_FIELD_SOURCES = {
+    'genre_names': ['genres'],
+    'main_cast': ['cast'],
+    'director': ['crew'],
+    'release_year': ['release_date'],
+    'release_month': ['release_date'],
+    'roi': ['budget', 'revenue']
+}
+
+# Types of the numeric TMDB columns, passed to read_csv for projected loads
+RAW_DTYPES = {
+    'id': 'int64',
+    'budget': 'int64',
+    'revenue': 'int64',
+    'vote_count': 'int64',
+    'popularity': 'float64',
+    'runtime': 'float64',
+    'vote_average': 'float64'
+}
 
 class MovieDataLoader:
-    def __init__(self, file_path, log_level=logging.INFO):
+    def __init__(self, file_path, log_level=logging.INFO, derived_only=False):
         """
         Initialize MovieDataLoader with logging
         
         Args:
             file_path (str): Path to the movies CSV file
             log_level (int): Logging level
+            derived_only (bool): Reduce 'genres', 'cast' and 'crew' straight
+                to 'genre_names', 'main_cast' and 'director' while parsing,
+                without keeping the full lists of dicts
         """
         self.file_path = file_path
+        self.derived_only = derived_only
+        self.parse_stats = {}
+        self.refresh_stats = {}
         
         # Configure logging
         logging.basicConfig(
@@ -22,17 +70,28 @@ class MovieDataLoader:
         )
         self.logger = logging.getLogger(__name__)
     
-    def load_data(self):
+    def load_data(self, chunksize=None, n_workers=None):
         """
         Load and clean movie dataset
         
+        Args:
+            chunksize (int, optional): Read and clean the file in chunks of
+                this many rows across a process pool; the whole file is
+                read at once when omitted
+            n_workers (int, optional): Worker processes for chunked loading,
+                defaults to the CPU count; 1 cleans chunks in this process
+        
         Returns:
             pd.DataFrame: Cleaned and processed movie dataset
         """
         try:
+            if chunksize is not None:
+                return self._load_chunked(chunksize, n_workers)
+            
             # Read CSV file
             self.logger.info(f"Loading data from {self.file_path}")
-            df = pd.read_csv(self.file_path)
+            with INSTRUMENTATION.stage('read_csv'):
+                df = pd.read_csv(self.file_path)
             
             # Log initial dataset info
             self.logger.info(f"Initial dataset shape: {df.shape}")
@@ -49,6 +108,98 @@ class MovieDataLoader:
             self.logger.error(f"Error loading dataset: {e}")
             raise
     
+    def load_fields(self, fields):
+        """
+        Load only the columns needed for some output fields
+        
+        Only the raw columns the fields are built from are read, with the
+        numeric ones typed up front. Nothing is cleaned or derived until a
+        field is first accessed, so a consumer that only needs numeric
+        metrics never parses the nested JSON columns.
+        
+        Args:
+            fields (list): Output fields, raw columns such as 'budget' or
+                derived ones such as 'director', see DERIVED_FIELD_SOURCES
+        
+        Returns:
+            LazyCatalog: The requested fields, cleaned on first access
+        """
+        fields = list(dict.fromkeys(fields))
+        columns = required_columns(fields)
+        available = pd.read_csv(self.file_path, nrows=0).columns
+        missing = [column for column in columns if column not in available]
+        if missing:
+            raise ValueError(f"{self.file_path} has no column(s) {missing} needed for {fields}")
+        
+        dtypes = {column: RAW_DTYPES[column] for column in columns if column in RAW_DTYPES}
+        self.logger.info(f"Loading columns {columns} from {self.file_path}")
+        with INSTRUMENTATION.stage('read_csv'):
+            try:
+                raw = pd.read_csv(self.file_path, usecols=columns, dtype=dtypes)
+            except ValueError as e:
+                # Typically missing values in an integer column
+                self.logger.warning(f"Falling back to inferred column types: {e}")
+                raw = pd.read_csv(self.file_path, usecols=columns)
+        INSTRUMENTATION.count('rows_processed', len(raw))
+        
+        return LazyCatalog(self, raw[columns], fields)
+    
+    def _load_chunked(self, chunksize, n_workers=None):
+        """
+        Clean the CSV chunk by chunk, in parallel worker processes
+        
+        Only a bounded number of raw chunks are in flight at once, and each
+        is released as soon as its cleaned result comes back, so the raw and
+        cleaned catalog are never held in memory together.
+        
+        Args:
+            chunksize (int): Rows per chunk
+            n_workers (int, optional): Worker processes
+        
+        Returns:
+            pd.DataFrame: Cleaned DataFrame in the original row order
+        """
+        n_workers = n_workers or os.cpu_count() or 1
+        self.logger.info(
+            f"Loading data from {self.file_path} in chunks of {chunksize} rows "
+            f"with {n_workers} worker(s)"
+        )
+        
+        chunks = pd.read_csv(self.file_path, chunksize=chunksize)
+        cleaned_chunks = []
+        parse_stats = {}
+        
+        def collect(result, in_worker=False):
+            cleaned, stats = result
+            cleaned_chunks.append(cleaned)
+            if in_worker:
+                # Worker processes have their own instrumentation; count here instead
+                self._record_cleaning(len(cleaned), stats)
+            for column, counts in stats.items():
+                totals = parse_stats.setdefault(column, dict.fromkeys(counts, 0))
+                for key, value in counts.items():
+                    totals[key] += value
+        
+        if n_workers == 1:
+            for chunk in chunks:
+                collect(_clean_chunk(self, chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                # Futures complete out of order but are collected in submission order
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(executor.submit(_clean_chunk, self, chunk))
+                    if len(pending) >= 2 * n_workers:
+                        collect(pending.popleft().result(), in_worker=True)
+                while pending:
+                    collect(pending.popleft().result(), in_worker=True)
+        
+        self.parse_stats = parse_stats
+        cleaned_df = pd.concat(cleaned_chunks)
+        self.logger.info(f"Cleaned dataset shape: {cleaned_df.shape}")
+        
+        return cleaned_df
+    
     def _clean_data(self, df):
         """
         Comprehensive data cleaning method
@@ -61,34 +212,106 @@ class MovieDataLoader:
         """
         # Deep copy to avoid warnings
         df = df.copy()
+        self.parse_stats = {
+            column: {'json': 0, 'fallback': 0, 'failed': 0}
+            for column in NESTED_COLUMNS
+        }
         
         # Cleaning methods for specific columns
-        cleaning_methods = {
-            'genres': self._clean_genres,
-            'homepage': self._clean_homepage,
-            'keywords': self._clean_keywords,
-            'overview': self._clean_overview,
-            'release_date': self._clean_release_date,
-            'runtime': self._clean_runtime,
-            'tagline': self._clean_tagline,
-            'cast': self._clean_cast,
-            'crew': self._clean_crew
-        }
+        cleaning_methods = self._cleaning_methods()
+        
+        # Columns reduced directly to their derived field in derived_only mode
+        derived_fields = self._reduced_fields()
         
         # Apply cleaning methods
         for column, method in cleaning_methods.items():
             if column in df.columns:
                 try:
-                    df[column] = df[column].apply(method)
+                    with INSTRUMENTATION.stage(f'clean.{column}'):
+                        if self.derived_only and column in derived_fields:
+                            field, derive = derived_fields[column]
+                            df[field] = df[column].apply(lambda value: derive(method(value)))
+                            df = df.drop(columns=column)
+                        else:
+                            df[column] = df[column].apply(method)
                     self.logger.info(f"Cleaned column: {column}")
                 except Exception as e:
                     self.logger.warning(f"Error cleaning {column}: {e}")
         
+        for column, counts in self.parse_stats.items():
+            if counts['fallback'] or counts['failed']:
+                self.logger.info(
+                    f"Parsed {column}: {counts['json']} json, "
+                    f"{counts['fallback']} literal_eval fallbacks, {counts['failed']} failures"
+                )
+        
         # Additional data enrichment
-        df = self._enrich_data(df)
+        with INSTRUMENTATION.stage('clean.enrich'):
+            df = self._enrich_data(df)
+        self._record_cleaning(len(df), self.parse_stats)
         
         return df
     
+    def _record_cleaning(self, n_rows, parse_stats):
+        """Report cleaned rows and nested-column parse outcomes to INSTRUMENTATION"""
+        if not INSTRUMENTATION.enabled:
+            return
+        INSTRUMENTATION.count('rows_processed', n_rows)
+        for column, counts in parse_stats.items():
+            if counts['fallback']:
+                INSTRUMENTATION.count('parse_fallbacks', counts['fallback'], column=column)
+            if counts['failed']:
+                INSTRUMENTATION.count('parse_failures', counts['failed'], column=column)
+    
+    def _cleaning_methods(self):
+        """Cleaning method of each raw column that has one"""
+        return {
+            'genres': self._clean_genres,
+            'homepage': self._clean_homepage,
+            'keywords': self._clean_keywords,
+            'overview': self._clean_overview,
+            'release_date': self._clean_release_date,
+            'runtime': self._clean_runtime,
+            'tagline': self._clean_tagline,
+            'cast': self._clean_cast,
+            'crew': self._clean_crew
+        }
+    
+    def _reduced_fields(self):
+        """Nested columns mapped to the field derived from them and its function"""
+        return {
+            'genres': ('genre_names', self._genre_names),
+            'cast': ('main_cast', self._main_cast),
+            'crew': ('director', self._extract_director)
+        }
+    
+    def _parse_nested(self, value, column):
+        """
+        Parse a JSON-encoded column value, falling back to literal_eval
+
+        Args:
+            value (str): Raw cell value
+            column (str): Column name used for parse statistics
+
+        Returns:
+            list: Parsed value
+        """
+        counts = self.parse_stats.setdefault(column, {'json': 0, 'fallback': 0, 'failed': 0})
+        try:
+            parsed = _json_loads(value)
+            counts['json'] += 1
+            return parsed
+        except ValueError:
+            pass
+        
+        try:
+            parsed = literal_eval(value)
+            counts['fallback'] += 1
+            return parsed
+        except Exception:
+            counts['failed'] += 1
+            raise
+    
     def _clean_genres(self, genres):
         """Clean and standardize genres"""
         try:
@@ -97,7 +320,7 @@ class MovieDataLoader:
                 return [{'name': 'Unknown'}]
             
             # Parse string representation or use existing
-            parsed_genres = literal_eval(genres) if isinstance(genres, str) else genres
+            parsed_genres = self._parse_nested(genres, 'genres') if isinstance(genres, str) else genres
             
             # Ensure list of dicts with 'name' key
             if not parsed_genres:
@@ -121,7 +344,7 @@ class MovieDataLoader:
             if pd.isna(keywords) or keywords == '':
                 return []
             
-            parsed_keywords = literal_eval(keywords) if isinstance(keywords, str) else keywords
+            parsed_keywords = self._parse_nested(keywords, 'keywords') if isinstance(keywords, str) else keywords
             return parsed_keywords if parsed_keywords else []
         except Exception:
             return []
@@ -137,6 +360,14 @@ class MovieDataLoader:
         except Exception:
             return pd.NaT
     
+    def _clean_release_dates(self, dates):
+        """_clean_release_date for a whole column: ISO dates at once, the rest one by one"""
+        parsed = pd.to_datetime(dates, format='ISO8601', errors='coerce')
+        retry = parsed.isna() & dates.notna()
+        if retry.any():
+            parsed[retry] = dates[retry].apply(self._clean_release_date)
+        return parsed
+    
     def _clean_runtime(self, runtime):
         """Clean runtime column"""
         return runtime if pd.notna(runtime) else np.nan
@@ -151,7 +382,7 @@ class MovieDataLoader:
             if pd.isna(cast) or cast == '':
                 return []
             
-            parsed_cast = literal_eval(cast) if isinstance(cast, str) else cast
+            parsed_cast = self._parse_nested(cast, 'cast') if isinstance(cast, str) else cast
             return parsed_cast if parsed_cast else []
         except Exception:
             return []
@@ -162,7 +393,7 @@ class MovieDataLoader:
             if pd.isna(crew) or crew == '':
                 return []
             
-            parsed_crew = literal_eval(crew) if isinstance(crew, str) else crew
+            parsed_crew = self._parse_nested(crew, 'crew') if isinstance(crew, str) else crew
             return parsed_crew if parsed_crew else []
         except Exception:
             return []
@@ -178,31 +409,38 @@ class MovieDataLoader:
             pd.DataFrame: DataFrame with additional features
         """
         # Extract director
-        df['director'] = df['crew'].apply(self._extract_director)
+        if 'crew' in df.columns:
+            df['director'] = df['crew'].apply(self._extract_director)
         
         # Extract main cast (top 3)
-        df['main_cast'] = df['cast'].apply(
-            lambda x: [actor['name'] for actor in x[:3]] if x else []
-        )
+        if 'cast' in df.columns:
+            df['main_cast'] = df['cast'].apply(self._main_cast)
         
         # Extract genre names
-        df['genre_names'] = df['genres'].apply(
-            lambda x: [genre['name'] for genre in x]
-        )
+        if 'genres' in df.columns:
+            df['genre_names'] = df['genres'].apply(self._genre_names)
         
         # Add release year and month
         df['release_year'] = df['release_date'].dt.year
         df['release_month'] = df['release_date'].dt.month
         
         # Compute additional metrics
-        df['roi'] = np.where(
-            df['budget'] > 0, 
-            (df['revenue'] - df['budget']) / df['budget'], 
-            0
-        )
+        df['roi'] = self._roi(df['budget'], df['revenue'])
         
         return df
     
+    def _roi(self, budget, revenue):
+        """Return on investment, 0 where the budget is unknown"""
+        return np.where(budget > 0, (revenue - budget) / budget, 0)
+    
+    def _main_cast(self, cast):
+        """Names of the top 3 billed actors"""
+        return [actor['name'] for actor in cast[:3]] if cast else []
+    
+    def _genre_names(self, genres):
+        """Names of a movie's genres"""
+        return [genre['name'] for genre in genres]
+    
     def _extract_director(self, crew):
         """Extract primary director from crew"""
         if not crew:
@@ -216,6 +454,134 @@ class MovieDataLoader:
         
         return directors[0] if directors else 'Unknown'
     
+    def save_cache(self, df, cache_path, source_hashes=None):
+        """
+        Write a cleaned DataFrame to a typed Parquet cache
+        
+        List columns are stored as Arrow list columns and the columns in
+        CATEGORICAL_COLUMNS are dictionary-encoded, so the cache reads back
+        with the same types instead of strings.
+        
+        Args:
+            df (pd.DataFrame): Cleaned (and optionally enriched) DataFrame
+            cache_path (str): Destination .parquet file
+            source_hashes (pd.Series, optional): Raw row hashes aligned with
+                df, needed for incremental refresh
+        """
+        pa, pq = _require_pyarrow()
+        
+        df = self._categorize(df)
+        if source_hashes is not None:
+            df[SOURCE_HASH_COLUMN] = np.asarray(source_hashes, dtype=np.uint64)
+        
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, cache_path)
+        self.logger.info(f"Saved {len(df)} rows to cache {cache_path}")
+    
+    def load_cache(self, cache_path, columns=None):
+        """
+        Read a DataFrame written by save_cache
+        
+        Args:
+            cache_path (str): Parquet cache file
+            columns (list, optional): Subset of columns to read
+        
+        Returns:
+            pd.DataFrame: Cached DataFrame with list and datetime columns intact
+        """
+        pa, pq = _require_pyarrow()
+        
+        table = pq.read_table(cache_path, columns=columns)
+        if SOURCE_HASH_COLUMN in table.column_names:
+            table = table.drop([SOURCE_HASH_COLUMN])
+        
+        # to_pandas turns list cells into numpy arrays; keep them as lists
+        list_columns = [
+            field.name for field in table.schema
+            if pa.types.is_list(field.type) or pa.types.is_large_list(field.type)
+        ]
+        df = table.drop(list_columns).to_pandas()
+        for column in list_columns:
+            df[column] = table.column(column).to_pylist()
+        
+        return df[table.column_names]
+    
+    def refresh_cache(self, cache_path):
+        """
+        Bring the cache up to date with the CSV, recleaning only what changed
+        
+        Rows are matched on 'id' and a hash of the raw CSV row. New and
+        changed rows are cleaned, removed rows are dropped, and everything
+        else is reused from the cache. Falls back to a full rebuild when
+        there is no usable cache or 'id' is not unique.
+        
+        Args:
+            cache_path (str): Parquet cache file
+        
+        Returns:
+            pd.DataFrame: Cleaned DataFrame in CSV row order
+        """
+        _, pq = _require_pyarrow()
+        
+        with INSTRUMENTATION.stage('read_csv'):
+            raw = pd.read_csv(self.file_path)
+        hashes = pd.util.hash_pandas_object(raw, index=False)
+        
+        cached_keys = None
+        if os.path.exists(cache_path) and 'id' in raw.columns and raw['id'].is_unique:
+            schema = pq.read_schema(cache_path)
+            if SOURCE_HASH_COLUMN in schema.names and 'id' in schema.names:
+                cached_keys = pq.read_table(
+                    cache_path, columns=['id', SOURCE_HASH_COLUMN]
+                ).to_pandas()
+        
+        if cached_keys is None:
+            df = self._clean_data(raw)
+            self.save_cache(df, cache_path, hashes)
+            self.refresh_stats = {'added': len(raw), 'changed': 0, 'removed': 0, 'unchanged': 0}
+            return self._categorize(df)
+        
+        raw_keys = pd.MultiIndex.from_arrays([raw['id'], hashes])
+        unchanged = raw_keys.isin(
+            pd.MultiIndex.from_arrays([cached_keys['id'], cached_keys[SOURCE_HASH_COLUMN]])
+        )
+        known = raw['id'].isin(cached_keys['id']).to_numpy()
+        self.refresh_stats = {
+            'added': int((~unchanged & ~known).sum()),
+            'changed': int((~unchanged & known).sum()),
+            'removed': int((~cached_keys['id'].isin(raw['id'])).sum()),
+            'unchanged': int(unchanged.sum())
+        }
+        self.logger.info(f"Cache refresh: {self.refresh_stats}")
+        
+        if unchanged.all() and not self.refresh_stats['removed']:
+            return self.load_cache(cache_path)
+        
+        kept = self.load_cache(cache_path)
+        kept = kept[kept['id'].isin(raw['id'][unchanged])]
+        parts = [kept]
+        if not unchanged.all():
+            parts.append(self._clean_data(raw[~unchanged]))
+        
+        # Restore the CSV row order
+        position = pd.Series(np.arange(len(raw)), index=raw['id'])
+        df = pd.concat(parts)
+        df = df.iloc[np.argsort(position[df['id']].to_numpy())].reset_index(drop=True)
+        
+        self.save_cache(df, cache_path, hashes)
+        return self._categorize(df)
+    
+    def _categorize(self, df):
+        """Copy of df with the low-cardinality string columns as categoricals"""
+        df = df.copy()
+        for column in CATEGORICAL_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].astype('category')
+        return df
+    
     def validate_cleaning(self, df):
         """
         Validate data cleaning process
@@ -232,6 +598,7 @@ class MovieDataLoader:
             'missing_values': df.isnull().sum().to_dict(),
             'data_types': df.dtypes.to_dict(),
             'genre_distribution': df['genre_names'].explode().value_counts().head(10).to_dict(),
+            'parse_stats': self.parse_stats,
             'year_range': {
                 'min_year': df['release_year'].min(),
                 'max_year': df['release_year'].max()
@@ -240,6 +607,118 @@ class MovieDataLoader:
         
         return validation_results
 
+class LazyCatalog:
+    """
+    Projected columns of the catalog, cleaned and derived on first access
+    
+    Returned by MovieDataLoader.load_fields. Index it like a DataFrame to
+    get one field as a Series, or call to_frame() for all of them. Each
+    raw column is cleaned at most once, and nested columns are reduced
+    straight to their derived field without keeping the parsed lists.
+    """
+    
+    def __init__(self, loader, raw, fields):
+        """
+        Args:
+            loader (MovieDataLoader): Loader whose cleaning methods apply
+            raw (pd.DataFrame): Raw columns the fields are built from
+            fields (list): Output fields
+        """
+        self.loader = loader
+        self.fields = list(fields)
+        self._raw = raw
+        self._cleaned = {}
+        self._values = {}
+    
+    def __len__(self):
+        return len(self._raw)
+    
+    def __contains__(self, field):
+        return field in self.fields
+    
+    @property
+    def columns(self):
+        return list(self.fields)
+    
+    def __getitem__(self, field):
+        if field not in self.fields:
+            raise KeyError(field)
+        if field not in self._values:
+            with INSTRUMENTATION.stage(f'derive.{field}'):
+                self._values[field] = self._derive(field)
+        return self._values[field]
+    
+    def _derive(self, field):
+        loader = self.loader
+        reduced = {derived: (column, derive) for column, (derived, derive) in loader._reduced_fields().items()}
+        if field in reduced:
+            column, derive = reduced[field]
+            if column in self._cleaned:
+                return self._cleaned[column].apply(derive).rename(field)
+            clean = loader._cleaning_methods()[column]
+            return self._raw[column].apply(lambda value: derive(clean(value))).rename(field)
+        if field in ('release_year', 'release_month'):
+            dates = self._clean('release_date')
+            return getattr(dates.dt, field.split('_')[1]).rename(field)
+        if field == 'roi':
+            budget, revenue = self._clean('budget'), self._clean('revenue')
+            return pd.Series(loader._roi(budget, revenue), index=self._raw.index, name=field)
+        return self._clean(field)
+    
+    def _clean(self, column):
+        """Raw column after its cleaning method, if it has one"""
+        if column not in self._cleaned:
+            method = self.loader._cleaning_methods().get(column)
+            values = self._raw[column]
+            if method is not None:
+                with INSTRUMENTATION.stage(f'clean.{column}'):
+                    if column == 'release_date':
+                        values = self.loader._clean_release_dates(values)
+                    else:
+                        values = values.apply(method)
+            self._cleaned[column] = values
+        return self._cleaned[column]
+    
+    def to_frame(self):
+        """
+        Materialize every requested field
+        
+        Returns:
+            pd.DataFrame: One column per field, in request order
+        """
+        return pd.DataFrame({field: self[field] for field in self.fields}, index=self._raw.index)
+
+def required_columns(fields):
+    """
+    Raw CSV columns needed to build some output fields
+    
+    Args:
+        fields (iterable): Raw or derived field names
+    
+    Returns:
+        list: Raw column names, in first-needed order
+    """
+    columns = []
+    for field in fields:
+        for column in DERIVED_FIELD_SOURCES.get(field, [field]):
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+def _require_pyarrow():
+    """Import pyarrow, which is only needed for the Parquet cache"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("The Parquet cache requires pyarrow: pip install pyarrow") from e
+    return pa, pq
+
+def _clean_chunk(loader, chunk):
+    """Clean one chunk in a worker process and return it with its parse statistics"""
+    cleaned = loader._clean_data(chunk)
+    return cleaned, loader.parse_stats
+
 def main():
     # Example usage
     loader = MovieDataLoader('movies.csv')
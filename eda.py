@@ -1,14 +1,216 @@
+import pickle
+
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from matplotlib.colors import LogNorm
+
+# Columns with precomputed top-movie rankings in EDAAggregates
+TOP_MOVIE_COLUMNS = ['revenue', 'budget', 'vote_average', 'vote_count', 'popularity', 'roi']
+
+# Above this many rows, scatter plots are drawn as a binned density grid
+DENSITY_ROW_THRESHOLD = 20000
+
+# Bins per axis of density grids
+DENSITY_BINS = 60
+
+# Most points of a line series and bars of a bar chart that get drawn
+MAX_LINE_POINTS = 1000
+MAX_BARS = 50
+
+def density_grid(x, y, bins=DENSITY_BINS, log=True):
+    """
+    Count points in a 2D grid of bins, for drawing instead of the points
+    
+    Args:
+        x (array-like): Horizontal values
+        y (array-like): Vertical values
+        bins (int): Bins per axis
+        log (bool): Space bins logarithmically; points with a value <= 0
+            cannot be placed on log axes and are left out
+    
+    Returns:
+        tuple: (counts, x_edges, y_edges) with counts[i, j] the number of
+            points in x bin i and y bin j, and bins + 1 edges per axis
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    keep = np.isfinite(x) & np.isfinite(y)
+    if log:
+        keep &= (x > 0) & (y > 0)
+        x, y = np.log10(x[keep]), np.log10(y[keep])
+    else:
+        x, y = x[keep], y[keep]
+    
+    edges = []
+    for values in (x, y):
+        low, high = (values.min(), values.max()) if len(values) else (0.0, 1.0)
+        if high <= low:
+            high = low + 1.0
+        edges.append(np.linspace(low, high, bins + 1))
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=edges)
+    if log:
+        x_edges, y_edges = 10 ** x_edges, 10 ** y_edges
+    return counts.astype(np.int64), x_edges, y_edges
+
+def downsample_line(series, max_points=MAX_LINE_POINTS):
+    """
+    Thin a line series while keeping its shape
+    
+    The series is split into buckets of consecutive points and each
+    bucket keeps only its lowest and highest point, so peaks and dips
+    survive. The first and last points are always kept.
+    
+    Args:
+        series (pd.Series): Values in drawing order
+        max_points (int): Most points kept
+    
+    Returns:
+        pd.Series: The series itself if short enough, else a subset of it
+    """
+    if len(series) <= max_points:
+        return series
+    values = series.to_numpy(dtype=np.float64)
+    bounds = np.linspace(0, len(values), max((max_points - 2) // 2, 1) + 1).astype(np.int64)
+    lows = np.where(np.isnan(values), np.inf, values)
+    highs = np.where(np.isnan(values), -np.inf, values)
+    keep = [0, len(values) - 1]
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        if stop > start:
+            keep.append(start + int(np.argmin(lows[start:stop])))
+            keep.append(start + int(np.argmax(highs[start:stop])))
+    return series.iloc[np.unique(keep)]
+
+def downsample_bars(series, max_bars=MAX_BARS, other_label='Other'):
+    """
+    Keep the largest bars and sum the rest into one
+    
+    Args:
+        series (pd.Series): Bar heights by label
+        max_bars (int): Most bars kept, including the combined one
+        other_label (str): Label of the combined bar
+    
+    Returns:
+        pd.Series: The series itself if short enough, else its largest
+            max_bars - 1 bars in their original order plus other_label
+    """
+    if len(series) <= max_bars:
+        return series
+    largest = series.nlargest(max_bars - 1).index
+    kept = series[series.index.isin(largest)]
+    other = pd.Series([series[~series.index.isin(largest)].sum()], index=[other_label])
+    return pd.concat([kept, other])
+
+class EDAAggregates:
+    """
+    Dataset-level aggregates behind the EDA views, built in one pass
+    
+    Attributes:
+        version (str): Catalog version the aggregates were built from
+        basic_stats (dict): Same as MovieEDA.generate_basic_stats
+        yearly_counts (pd.Series): Movies per release year, by year
+        genre_counts (pd.Series): Movies per genre, most common first
+        language_counts (pd.Series): Movies per original language
+        genre_performance (pd.DataFrame): Count, average revenue, rating
+            and ROI per genre, most common genre first
+        top_movies (dict): Column name to its top_n movies, best first
+        year_range (tuple): Earliest and latest release year, or None
+        budget_revenue_density (tuple): density_grid of budget and revenue
+    """
+    
+    def __init__(self, df, version=None, top_n=100):
+        """
+        Args:
+            df (pd.DataFrame): Cleaned movie dataset
+            version (str, optional): Catalog version to stamp the store with
+            top_n (int): Movies kept per top-movie ranking
+        """
+        self.version = version
+        self.top_n = top_n
+        self.basic_stats = {
+            'total_movies': len(df),
+            'avg_budget': df['budget'].mean(),
+            'avg_revenue': df['revenue'].mean(),
+            'avg_rating': df['vote_average'].mean(),
+            'avg_runtime': df['runtime'].mean()
+        }
+        
+        years = df['release_year']
+        self.yearly_counts = df.groupby('release_year').size()
+        self.year_range = (int(years.min()), int(years.max())) if years.notna().any() else None
+        self.language_counts = df['original_language'].value_counts()
+        
+        # One explode of the genre lists feeds both genre views
+        genres = df['genre_names'].explode().dropna()
+        self.genre_counts = genres.value_counts().rename_axis(None)
+        rows = genres.index
+        metrics = pd.DataFrame({
+            'genre': genres.to_numpy(),
+            'revenue': df.loc[rows, 'revenue'].to_numpy(dtype=np.float64),
+            'vote_average': df.loc[rows, 'vote_average'].to_numpy(dtype=np.float64),
+            'roi': df.loc[rows, 'roi'].to_numpy(dtype=np.float64) if 'roi' in df.columns else np.nan
+        })
+        self.genre_performance = metrics.groupby('genre', sort=False).agg(
+            movie_count=('revenue', 'size'),
+            avg_revenue=('revenue', 'mean'),
+            avg_rating=('vote_average', 'mean'),
+            avg_roi=('roi', 'mean')
+        ).sort_values('movie_count', ascending=False, kind='stable').reset_index()
+        
+        self.budget_revenue_density = density_grid(df['budget'], df['revenue'])
+        
+        self.top_movies = {
+            column: df.nlargest(top_n, column)[
+                list(dict.fromkeys(['title', column, 'release_date', 'vote_average']))
+            ]
+            for column in TOP_MOVIE_COLUMNS if column in df.columns
+        }
+    
+    def save(self, path):
+        """Pickle the aggregates to path"""
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    @staticmethod
+    def load(path, version=None):
+        """
+        Load aggregates saved by save()
+        
+        Args:
+            path (str): File written by save()
+            version (str, optional): Required catalog version
+        
+        Returns:
+            EDAAggregates: The aggregates, or None when the file is missing,
+                unreadable or from another version
+        """
+        try:
+            with open(path, 'rb') as f:
+                aggregates = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+            return None
+        if version is not None and aggregates.version != version:
+            return None
+        return aggregates
 
 class MovieEDA:
-    def __init__(self, df):
+    def __init__(self, df, aggregates=None):
+        """
+        Args:
+            df (pd.DataFrame): Cleaned movie dataset
+            aggregates (EDAAggregates, optional): Precomputed aggregates of
+                df; the summary methods then read from them instead of
+                scanning the rows
+        """
         self.df = df
+        self.aggregates = aggregates
 
         
     def generate_basic_stats(self):
         """Generate basic statistical analysis"""
+        if self.aggregates is not None:
+            return dict(self.aggregates.basic_stats)
         return {
             'total_movies': len(self.df),
             'avg_budget': self.df['budget'].mean(),
@@ -19,21 +221,64 @@ class MovieEDA:
     
     def get_top_movies(self, column, n=10):
         """Get top N movies by specified column"""
+        if self.aggregates is not None and column in self.aggregates.top_movies and n <= self.aggregates.top_n:
+            return self.aggregates.top_movies[column].head(n).to_dict('records')
         return self.df.nlargest(n, column)[
             ['title', column, 'release_date', 'vote_average']
         ].to_dict('records')
     
     def analyze_genres(self):
         """Analyze genre distribution"""
-        genres = []
-        for genre_list in self.df['genre_names']:
-            genres.extend(genre_list)
-        return pd.Series(genres).value_counts()
+        if self.aggregates is not None:
+            return self.aggregates.genre_counts.copy()
+        return self.df['genre_names'].explode().dropna().value_counts().rename_axis(None)
     
     def analyze_languages(self):
         """Analyze language distribution"""
+        if self.aggregates is not None:
+            return self.aggregates.language_counts.copy()
         return self.df['original_language'].value_counts()
     
+    def analyze_years(self):
+        """Count movies per release year"""
+        if self.aggregates is not None:
+            return self.aggregates.yearly_counts.copy()
+        return self.df.groupby('release_year').size()
+    
+    def genre_performance(self):
+        """Movie count, average revenue, rating and ROI per genre"""
+        aggregates = self.aggregates if self.aggregates is not None else EDAAggregates(self.df, top_n=0)
+        return aggregates.genre_performance.copy()
+    
+    def budget_revenue_density(self, bins=DENSITY_BINS):
+        """
+        Budget and revenue binned on log axes, see density_grid
+        
+        Args:
+            bins (int): Bins per axis
+        
+        Returns:
+            tuple: (counts, budget_edges, revenue_edges)
+        """
+        stored = getattr(self.aggregates, 'budget_revenue_density', None)
+        if stored is not None and len(stored[1]) == bins + 1:
+            return stored
+        return density_grid(self.df['budget'], self.df['revenue'], bins=bins)
+    
+    def build_aggregates(self, version=None, top_n=100):
+        """
+        Compute and attach the aggregate store for this dataset
+        
+        Args:
+            version (str, optional): Catalog version to stamp it with
+            top_n (int): Movies kept per top-movie ranking
+        
+        Returns:
+            EDAAggregates: The aggregates
+        """
+        self.aggregates = EDAAggregates(self.df, version=version, top_n=top_n)
+        return self.aggregates
+    
     def plot_genre_distribution(self, save_path=None):
         """Plot top genres distribution"""
         plt.figure(figsize=(12, 6))
@@ -47,10 +292,32 @@ class MovieEDA:
             plt.savefig(save_path)
         return plt
     
-    def plot_budget_revenue_correlation(self, save_path=None):
-        """Plot budget vs revenue correlation"""
+    def plot_budget_revenue_correlation(self, save_path=None, mode='auto', threshold=DENSITY_ROW_THRESHOLD):
+        """
+        Plot budget vs revenue correlation
+        
+        Args:
+            save_path (str, optional): Where to save the figure
+            mode (str): 'scatter' draws every movie, 'density' draws a
+                log-scaled 2D histogram whose cost does not grow with the
+                catalog, 'auto' picks density above threshold rows
+            threshold (int): Rows above which 'auto' draws a density grid
+        """
+        if mode not in ('auto', 'scatter', 'density'):
+            raise ValueError(f"Unknown plot mode: {mode}")
+        if mode == 'auto':
+            mode = 'scatter' if self.df is not None and len(self.df) <= threshold else 'density'
+        
         plt.figure(figsize=(10, 6))
-        plt.scatter(self.df['budget'], self.df['revenue'], alpha=0.5)
+        if mode == 'scatter':
+            plt.scatter(self.df['budget'], self.df['revenue'], alpha=0.5)
+        else:
+            counts, budget_edges, revenue_edges = self.budget_revenue_density()
+            plt.pcolormesh(budget_edges, revenue_edges, np.ma.masked_equal(counts.T, 0),
+                           norm=LogNorm(), cmap='viridis')
+            plt.colorbar(label='Movies')
+            plt.xscale('log')
+            plt.yscale('log')
         plt.xlabel('Budget ($)')
         plt.ylabel('Revenue ($)')
         plt.title('Movie Budget vs Revenue')
@@ -1,31 +1,98 @@
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.preprocessing import StandardScaler, LabelEncoder, MultiLabelBinarizer
+import numpy as np
 import pandas as pd
 
+from instrumentation import staged
+
+# Raw nested columns dropped by compaction once their derived field exists
+RAW_DERIVED_COLUMNS = {'genres': 'genre_names', 'cast': 'main_cast', 'crew': 'director'}
+
+# Float columns returned in recommendation and EDA records, kept at float64
+# by compaction so compacted and full catalogs return the same values
+RECORD_FLOAT_COLUMNS = ['vote_average', 'popularity', 'roi']
+
+def genre_bitmask(genre_lists, genre_classes):
+    """
+    Encode each movie's genres as one integer, bit i set for genre_classes[i]
+    
+    Args:
+        genre_lists (iterable): Genre name lists, one per movie
+        genre_classes (list): Ordered genre names, at most 64
+    
+    Returns:
+        np.ndarray: uint32 bitmasks, or uint64 for more than 32 genres
+    """
+    if len(genre_classes) > 64:
+        raise ValueError(f"Too many genres for a 64-bit mask: {len(genre_classes)}")
+    
+    dtype = np.uint32 if len(genre_classes) <= 32 else np.uint64
+    bit = {genre: i for i, genre in enumerate(genre_classes)}
+    rows, cols = [], []
+    for row, genres in enumerate(genre_lists):
+        for genre in genres:
+            if genre in bit:
+                rows.append(row)
+                cols.append(bit[genre])
+    
+    masks = np.zeros(len(genre_lists), dtype=dtype)
+    np.bitwise_or.at(masks, np.array(rows, dtype=np.intp),
+                     np.left_shift(dtype(1), np.array(cols, dtype=dtype)))
+    return masks
+
 class FeatureEngineer:
     def __init__(self, df):
         self.df = df.copy()
         self.label_encoders = {}
-        
+        self.genre_classes = []
+        self.genre_matrix = None
+        self.compaction_report = {}
+    
+    @staged('features.combined')
     def create_combined_features(self):
         """Create combined features for content-based filtering"""
-        self.df['combined_features'] = self.df.apply(self._combine_text_features, axis=1)
+        overview, tagline, director = (
+            self._text_column(col) for col in ('overview', 'tagline', 'director')
+        )
+        
+        # Same layout as joining the per-row pieces: overview, tagline,
+        # genres, main cast, director, with missing text pieces skipped
+        combined = self.df['genre_names'].str.join(' ') + ' ' + self.df['main_cast'].str.join(' ')
+        combined = combined.where(~self._is_text(tagline, non_empty=True), tagline + ' ' + combined)
+        combined = combined.where(~self._is_text(overview), overview + ' ' + combined)
+        combined = combined.where(~self._is_text(director, non_empty=True), combined + ' ' + director)
+        
+        self.df['combined_features'] = combined
         return self.df
     
-    def _combine_text_features(self, row):
-        """Combine text features for a single movie"""
-        features = []
-        if isinstance(row['overview'], str):
-            features.append(row['overview'])
-        if isinstance(row['tagline'], str) and row['tagline']:
-            features.append(row['tagline'])
-        features.extend([' '.join(row['genre_names'])])
-        features.extend([' '.join(row['main_cast'])])
-        if row['director']:
-            features.append(row['director'])
-        return ' '.join(features)
-    
-    def encode_categorical_features(self):
-        """Encode categorical features"""
+    def _text_column(self, col):
+        """Column as plain strings; categoricals (e.g. from the cache) are decoded"""
+        series = self.df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(object)
+        return series
+    
+    @staticmethod
+    def _is_text(series, non_empty=False):
+        """Boolean mask of string values, optionally excluding empty strings"""
+        if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+            return pd.Series(False, index=series.index)
+        lengths = series.str.len()
+        return lengths.gt(0) if non_empty else lengths.notna()
+    
+    @staged('features.encode')
+    def encode_categorical_features(self, genre_output='columns'):
+        """
+        Encode categorical features
+        
+        Args:
+            genre_output (str): 'columns' adds one uint8 'genre_<name>'
+                column per genre; 'dense' or 'sparse' only keep the genre
+                one-hot block in genre_matrix as a uint8 array or a
+                scipy CSR matrix
+        """
+        if genre_output not in ('columns', 'dense', 'sparse'):
+            raise ValueError(f"Unknown genre output: {genre_output}")
+        
         categorical_cols = ['original_language', 'status']
         
         for col in categorical_cols:
@@ -33,17 +100,22 @@ class FeatureEngineer:
             self.df[f'{col}_encoded'] = le.fit_transform(self.df[col].astype(str))
             self.label_encoders[col] = le
             
-        # One-hot encode genres (multiple genres per movie)
-        genres = set()
-        for genre_list in self.df['genre_names']:
-            genres.update(genre_list)
-            
-        for genre in genres:
-            self.df[f'genre_{genre}'] = self.df['genre_names'].apply(
-                lambda x: 1 if genre in x else 0)
+        # One-hot encode genres (multiple genres per movie) in a single pass
+        binarizer = MultiLabelBinarizer(sparse_output=(genre_output == 'sparse'))
+        genre_matrix = binarizer.fit_transform(self.df['genre_names']).astype(np.uint8)
+        self.genre_classes = list(binarizer.classes_)
+        self.genre_matrix = genre_matrix
+        
+        if genre_output == 'columns':
+            genre_columns = [f'genre_{genre}' for genre in self.genre_classes]
+            self.df = pd.concat([
+                self.df.drop(columns=genre_columns, errors='ignore'),
+                pd.DataFrame(genre_matrix, columns=genre_columns, index=self.df.index)
+            ], axis=1)
         
         return self.df
     
+    @staged('features.normalize')
     def normalize_numeric_features(self):
         """Normalize numeric features"""
         numeric_cols = ['budget', 'revenue', 'runtime', 'popularity', 
@@ -55,4 +127,68 @@ class FeatureEngineer:
         for i, col in enumerate(numeric_cols):
             self.df[f'{col}_normalized'] = scaled_features[:, i]
             
+        return self.df
+    
+    @staged('features.compact')
+    def compact_features(self, drop_raw=True, category_ratio=0.5):
+        """
+        Shrink the frame's memory footprint
+        
+        Numeric columns are downcast to the narrowest type that holds
+        their values (integers to signed types, floats to float32 when
+        within its precision, except RECORD_FLOAT_COLUMNS),
+        low-cardinality strings become categoricals, genre one-hot columns
+        are replaced by a 'genre_mask' bitmask (bit i is genre_classes[i])
+        and, with drop_raw, the raw 'genres'/'cast'/'crew' lists are dropped
+        once their derived fields exist. Bytes saved per column are
+        recorded in compaction_report.
+        
+        Args:
+            drop_raw (bool): Drop raw nested columns with derived fields
+            category_ratio (float): Maximum unique/rows ratio for a string
+                column to become categorical
+        
+        Returns:
+            pd.DataFrame: Compacted DataFrame
+        """
+        before = self.df.memory_usage(deep=True, index=False)
+        
+        # Genre membership as one integer per movie
+        if not self.genre_classes:
+            self.genre_classes = sorted({g for genres in self.df['genre_names'] for g in genres})
+        self.df['genre_mask'] = genre_bitmask(self.df['genre_names'], self.genre_classes)
+        one_hot = [f'genre_{genre}' for genre in self.genre_classes]
+        self.df = self.df.drop(columns=one_hot, errors='ignore')
+        self.df.attrs['genre_classes'] = list(self.genre_classes)
+        
+        if drop_raw:
+            raw = [col for col, derived in RAW_DERIVED_COLUMNS.items()
+                   if col in self.df.columns and derived in self.df.columns]
+            self.df = self.df.drop(columns=raw)
+        
+        for col in self.df.columns:
+            series = self.df[col]
+            if pd.api.types.is_bool_dtype(series) or col == 'genre_mask':
+                continue
+            if pd.api.types.is_integer_dtype(series):
+                # Signed, so differences such as revenue - budget cannot wrap
+                self.df[col] = pd.to_numeric(series, downcast='integer')
+            elif pd.api.types.is_float_dtype(series) and col not in RECORD_FLOAT_COLUMNS:
+                narrow = series.astype(np.float32)
+                if np.allclose(narrow, series, rtol=1e-6, equal_nan=True):
+                    self.df[col] = narrow
+            elif (pd.api.types.infer_dtype(series, skipna=True) == 'string'
+                  and series.nunique() <= category_ratio * len(series)):
+                self.df[col] = series.astype('category')
+        
+        after = self.df.memory_usage(deep=True, index=False)
+        self.compaction_report = {
+            col: {
+                'before': int(before.get(col, 0)),
+                'after': int(after.get(col, 0)),
+                'saved': int(before.get(col, 0) - after.get(col, 0))
+            }
+            for col in before.index.union(after.index)
+        }
+        
         return self.df
\ No newline at end of file
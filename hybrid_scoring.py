@@ -0,0 +1,124 @@
+import numpy as np
+
+from feature_engineering import genre_bitmask
+from neighbor_index import top_k_indices
+
+# Default blend: text similarity dominates, the rest nudges the order
+HYBRID_WEIGHTS = {'similarity': 0.6, 'rating': 0.15, 'popularity': 0.1, 'votes': 0.05, 'genre': 0.1}
+
+# Per-movie signals and the numeric columns they come from
+SIGNAL_COLUMNS = {'rating': 'vote_average', 'popularity': 'popularity', 'votes': 'vote_count'}
+
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(values):
+    """Number of set bits in each element of an unsigned integer array"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    values = np.ascontiguousarray(values)
+    as_bytes = values.view(np.uint8).reshape(*values.shape, values.dtype.itemsize)
+    return _BYTE_POPCOUNT[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+
+class HybridScorer:
+    """
+    Rerank similarity candidates with rating, popularity and genre overlap
+
+    Each movie's numeric signals are precomputed once as values in [0, 1]
+    and its genres as a bitmask, so reranking a candidate list is a few
+    array gathers per query instead of a pass over the catalog.
+    """
+
+    def __init__(self, df, weights=None):
+        """
+        Args:
+            df (pd.DataFrame): Movie catalog with 'genre_names' and the
+                numeric columns in SIGNAL_COLUMNS, ideally already
+                standardized by FeatureEngineer.normalize_numeric_features
+            weights (dict, optional): Weights by signal name, see
+                HYBRID_WEIGHTS; missing names keep their default
+        """
+        self.weights = self._check_weights(weights)
+
+        # z-scores clipped to +-3 standard deviations and mapped to [0, 1]
+        self.signals = {
+            name: ((np.clip(self._z_scores(df, column), -3, 3) + 3) / 6).astype(np.float32)
+            for name, column in SIGNAL_COLUMNS.items()
+        }
+
+        genre_classes = sorted({genre for genres in df['genre_names'] for genre in genres})
+        self.genre_masks = genre_bitmask(df['genre_names'], genre_classes[:64])
+        self.genre_counts = popcount(self.genre_masks)
+
+    @staticmethod
+    def _check_weights(weights):
+        unknown = set(weights or {}) - set(HYBRID_WEIGHTS)
+        if unknown:
+            raise ValueError(f"Unknown hybrid weights: {sorted(unknown)}")
+        return {**HYBRID_WEIGHTS, **(weights or {})}
+
+    @staticmethod
+    def _z_scores(df, column):
+        """Standardized column, reusing the '<column>_normalized' feature if present"""
+        if f'{column}_normalized' in df.columns:
+            values = df[f'{column}_normalized'].to_numpy(dtype=np.float64)
+        else:
+            values = df[column].to_numpy(dtype=np.float64)
+            std = np.nanstd(values)
+            values = (values - np.nanmean(values)) / (std if std > 0 else 1.0)
+        return np.nan_to_num(values, nan=0.0)
+
+    def genre_overlap(self, rows, candidates):
+        """
+        Jaccard overlap of each candidate's genres with its query's genres
+
+        Args:
+            rows (np.ndarray): Query rows, shape (n_queries,)
+            candidates (np.ndarray): Candidate rows, shape (n_queries, m)
+
+        Returns:
+            np.ndarray: float32 overlaps in [0, 1], shape (n_queries, m)
+        """
+        query_masks = self.genre_masks[rows][:, None]
+        candidate_masks = self.genre_masks[candidates]
+        shared = popcount(query_masks & candidate_masks).astype(np.float32)
+        union = popcount(query_masks | candidate_masks).astype(np.float32)
+        return np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+
+    def rerank(self, rows, candidates, similarities, n, weights=None):
+        """
+        Blend similarity with the other signals and keep the best n
+
+        Args:
+            rows (np.ndarray): Query rows, shape (n_queries,)
+            candidates (np.ndarray): Candidate rows per query, padded with -1
+            similarities (np.ndarray): Cosine similarity of each candidate
+            n (int): Results kept per query
+            weights (dict, optional): Overrides of the scorer's weights
+
+        Returns:
+            tuple: (indices, scores) arrays of shape (n_queries, n), best
+                first and padded with -1 / -inf
+        """
+        weights = self.weights if weights is None else self._check_weights(weights)
+        valid = candidates >= 0
+        safe = np.where(valid, candidates, 0)
+
+        blended = weights['similarity'] * np.asarray(similarities, dtype=np.float64)
+        for name, signal in self.signals.items():
+            if weights[name]:
+                blended = blended + weights[name] * signal[safe]
+        if weights['genre']:
+            blended = blended + weights['genre'] * self.genre_overlap(rows, safe)
+        blended = np.where(valid, blended, -np.inf)
+
+        top = top_k_indices(blended, n)
+        indices = np.take_along_axis(candidates, top, axis=1)
+        scores = np.take_along_axis(blended, top, axis=1)
+        if indices.shape[1] < n:
+            pad = n - indices.shape[1]
+            indices = np.pad(indices, ((0, 0), (0, pad)), constant_values=-1)
+            scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+        indices[np.isneginf(scores)] = -1
+        return indices, scores
@@ -0,0 +1,429 @@
+import cProfile
+import functools
+import io
+import json
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then reported as None
+    resource = None
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Prefix of every exported Prometheus metric
+METRIC_PREFIX = 'movies'
+
+# Shared no-op context returned by stage() while instrumentation is off
+_DISABLED = nullcontext()
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with estimated percentiles"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.errors = 0
+
+    def observe(self, latency_ms, error=False):
+        """Record one request"""
+        index = next((i for i, bound in enumerate(self.buckets) if latency_ms <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += latency_ms
+        self.errors += error
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile"""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(q / 100 * self.count)
+        seen = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def snapshot(self):
+        """Counts, mean and percentile estimates as a JSON-ready dict"""
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            running += count
+            cumulative[str(bound)] = running
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'mean_ms': self.total_ms / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'buckets': cumulative
+        }
+
+    def prometheus_lines(self, metric, labels):
+        """
+        Sample lines of the histogram in the Prometheus text format
+
+        Args:
+            metric (str): Metric name without the _bucket/_sum/_count suffix
+            labels (dict): Labels identifying this histogram
+
+        Returns:
+            list: Lines without the # TYPE header
+        """
+        lines, running = [], 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            running += count
+            lines.append(f"{metric}_bucket{_labels({**labels, 'le': bound})} {running}")
+        lines.append(f"{metric}_sum{_labels(labels)} {self.total_ms}")
+        lines.append(f"{metric}_count{_labels(labels)} {self.count}")
+        return lines
+
+
+class Instrumentation:
+    """
+    Stage timers, counters and latency histograms for the pipeline
+
+    Off by default. While disabled, stage() hands back a shared no-op
+    context and count()/observe() return after one attribute check, so
+    the hooks left in the loader, feature engineer and recommender cost
+    next to nothing. Once enabled it records:
+
+        stages: calls, total seconds, peak traced memory (with
+            trace_memory) and process peak RSS at exit, per stage name
+        counters: e.g. rows processed and parse failures, with labels
+        latency: per-query latency histograms in milliseconds
+        profiles: cProfile summaries of the stages named in profile
+
+    Nested stages are timed independently; a stage's peak memory includes
+    its nested stages.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.profile = frozenset()
+        self.profile_dir = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def enable(self, trace_memory=False, profile=(), profile_dir=None):
+        """
+        Start recording
+
+        Args:
+            trace_memory (bool): Record each stage's peak Python allocation
+                with tracemalloc; precise, but slows the traced code down
+            profile (iterable): Stage names to run under cProfile
+            profile_dir (str, optional): Also dump each profiled stage to
+                '<profile_dir>/<stage>.prof' for snakeviz or pstats
+        """
+        self.trace_memory = trace_memory
+        self.profile = frozenset(profile)
+        self.profile_dir = profile_dir
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled = True
+
+    def disable(self):
+        """Stop recording; what was recorded is kept until reset()"""
+        self.enabled = False
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.trace_memory = False
+
+    def reset(self):
+        """Drop everything recorded so far"""
+        with self._lock:
+            self.stages = {}
+            self.counters = {}
+            self.latency = {}
+            self.profiles = {}
+
+    def stage(self, name):
+        """
+        Context manager timing one run of a pipeline stage
+
+        Args:
+            name (str): Stage name, e.g. 'load' or 'clean.cast'
+        """
+        if not self.enabled:
+            return _DISABLED
+        return self._stage(name)
+
+    @contextmanager
+    def _stage(self, name):
+        stack = self._memory_stack()
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                # Keep the enclosing stage's peak before resetting it
+                stack[-1][1] = max(stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            stack.append([current, current])
+
+        profiler = None
+        if name in self.profile and not getattr(self._local, 'profiling', False):
+            profiler = cProfile.Profile()
+            self._local.profiling = True
+            profiler.enable()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                self._local.profiling = False
+                self._save_profile(name, profiler)
+
+            traced = None
+            if self.trace_memory and stack:
+                start_memory, peak = stack.pop()
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                if stack:
+                    stack[-1][1] = max(stack[-1][1], peak)
+                traced = peak - start_memory
+
+            with self._lock:
+                record = self.stages.setdefault(
+                    name, {'calls': 0, 'seconds': 0.0, 'peak_traced_mb': None, 'peak_rss_mb': None}
+                )
+                record['calls'] += 1
+                record['seconds'] += seconds
+                record['peak_rss_mb'] = peak_rss_mb()
+                if traced is not None:
+                    record['peak_traced_mb'] = max(record['peak_traced_mb'] or 0.0, traced / 2 ** 20)
+
+    def _memory_stack(self):
+        stack = getattr(self._local, 'memory_stack', None)
+        if stack is None:
+            stack = self._local.memory_stack = []
+        return stack
+
+    def _save_profile(self, name, profiler):
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(25)
+        with self._lock:
+            self.profiles[name] = output.getvalue()
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.profile_dir, f'{name}.prof'))
+
+    def count(self, name, value=1, **labels):
+        """
+        Add to a counter
+
+        Args:
+            name (str): Counter name, e.g. 'rows_processed'
+            value (int): Amount added
+            **labels: Labels telling series of one counter apart
+        """
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, latency_ms, error=False):
+        """
+        Record one query's latency
+
+        Args:
+            name (str): Query name, e.g. 'get_recommendations'
+            latency_ms (float): Latency in milliseconds
+            error (bool): Whether the query raised
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.latency.get(name)
+            if histogram is None:
+                histogram = self.latency[name] = LatencyHistogram()
+            histogram.observe(latency_ms, error=error)
+
+    def report(self):
+        """
+        Everything recorded so far
+
+        Returns:
+            dict: JSON-ready 'stages', 'counters', 'latency' and 'profiles'
+        """
+        with self._lock:
+            return {
+                'stages': {name: dict(record) for name, record in self.stages.items()},
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                'latency': {name: histogram.snapshot() for name, histogram in self.latency.items()},
+                'profiles': dict(self.profiles)
+            }
+
+    def to_json(self, path=None):
+        """
+        JSON report, optionally written to a file
+
+        Args:
+            path (str, optional): Destination file
+
+        Returns:
+            str: The report as JSON
+        """
+        text = json.dumps(self.report(), indent=2)
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+    def to_prometheus(self):
+        """
+        Report in the Prometheus text exposition format
+
+        Returns:
+            str: Metrics prefixed with METRIC_PREFIX; profiles are left out
+        """
+        with self._lock:
+            stages = {name: dict(record) for name, record in self.stages.items()}
+            counters = dict(self.counters)
+            latency = dict(self.latency)
+
+        lines = []
+        stage_metrics = (
+            ('stage_calls_total', 'counter', 'calls', 1),
+            ('stage_seconds_total', 'counter', 'seconds', 1),
+            ('stage_peak_traced_bytes', 'gauge', 'peak_traced_mb', 2 ** 20),
+            ('stage_peak_rss_bytes', 'gauge', 'peak_rss_mb', 2 ** 20),
+        )
+        for metric, kind, field, scale in stage_metrics:
+            samples = [(name, record[field]) for name, record in stages.items() if record[field] is not None]
+            if samples:
+                lines.append(f"# TYPE {METRIC_PREFIX}_{metric} {kind}")
+                lines.extend(
+                    f"{METRIC_PREFIX}_{metric}{_labels({'stage': name})} {value * scale}"
+                    for name, value in samples
+                )
+
+        for counter in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {METRIC_PREFIX}_{counter}_total counter")
+            lines.extend(
+                f"{METRIC_PREFIX}_{counter}_total{_labels(dict(labels))} {value}"
+                for (name, labels), value in sorted(counters.items()) if name == counter
+            )
+
+        if latency:
+            metric = f"{METRIC_PREFIX}_query_latency_ms"
+            lines.append(f"# TYPE {metric} histogram")
+            for name, histogram in latency.items():
+                lines.extend(histogram.prometheus_lines(metric, {'query': name}))
+
+        return '\n'.join(lines) + '\n'
+
+    def configure_from_env(self, environ=None):
+        """
+        Enable from environment variables, for scripts without options
+
+        MOVIES_INSTRUMENT=1 enables recording, MOVIES_TRACE_MEMORY=1 adds
+        tracemalloc, MOVIES_PROFILE lists comma-separated stages to profile
+        and MOVIES_PROFILE_DIR is where their .prof files go.
+
+        Returns:
+            bool: Whether instrumentation is now enabled
+        """
+        environ = os.environ if environ is None else environ
+        if environ.get('MOVIES_INSTRUMENT', '') not in ('', '0'):
+            self.enable(
+                trace_memory=environ.get('MOVIES_TRACE_MEMORY', '') not in ('', '0'),
+                profile=[name for name in environ.get('MOVIES_PROFILE', '').split(',') if name],
+                profile_dir=environ.get('MOVIES_PROFILE_DIR') or None
+            )
+        return self.enabled
+
+
+# Process-wide instance the pipeline's hooks report to
+INSTRUMENTATION = Instrumentation()
+
+
+def staged(name):
+    """Decorator running every call of a function as stage(name)"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not INSTRUMENTATION.enabled:
+                return func(*args, **kwargs)
+            with INSTRUMENTATION._stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def timed(name):
+    """Decorator recording every call's latency in the histogram for name"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not INSTRUMENTATION.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            error = True
+            try:
+                result = func(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                INSTRUMENTATION.observe(name, (time.perf_counter() - start) * 1000, error=error)
+        return wrapper
+    return decorate
+
+
+def reset_peak_rss():
+    """
+    Reset the peak resident set size to the current one
+
+    Only Linux allows this, through /proc/self/clear_refs.
+
+    Returns:
+        bool: Whether the peak was reset
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """Process peak resident set size since start or the last reset_peak_rss(), in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def _labels(labels):
+    """Prometheus label set, e.g. {stage="load"}"""
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
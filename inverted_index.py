@@ -0,0 +1,118 @@
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+from row_keys import RowKeys
+
+
+class InvertedIndex:
+    def __init__(self, df):
+        """
+        Build inverted indexes from genre, director and cast member to rows
+
+        Entries hold stable RowKeys keys translated to rows on lookup, so
+        add() only touches the values of the new movies and remove() only
+        marks keys as gone.
+
+        Args:
+            df (pd.DataFrame): Movie catalog with 'genre_names' and
+                'vote_average' columns, and optionally 'director' and
+                'main_cast'
+        """
+        self.keys = RowKeys()
+        self.genres = {}
+        self.directors = {}
+        self.cast = {}
+        self.vote_average = np.empty(0, dtype=np.float64)
+        self.top_rated_by_genre = {}
+        self.add(df)
+
+    def add(self, df):
+        """
+        Index movies appended to the end of the catalog
+
+        Args:
+            df (pd.DataFrame): The new rows only, in catalog order
+        """
+        keys = self.keys.append(len(df))
+        self.vote_average = np.concatenate([self.vote_average, df['vote_average'].to_numpy(dtype=np.float64)])
+
+        positions, genres = self._explode(df['genre_names'])
+        touched = self._extend(self.genres, self._group(keys[positions], genres))
+        if 'director' in df.columns:
+            self._extend(self.directors, self._group(keys, df['director'].astype(object).to_numpy()))
+        if 'main_cast' in df.columns:
+            positions, cast = self._explode(df['main_cast'])
+            self._extend(self.cast, self._group(keys[positions], cast))
+
+        # Each genre's movies ranked by rating, highest first; ties keep
+        # catalog order and unrated movies are left out, like nlargest
+        for genre in touched:
+            self.top_rated_by_genre[genre] = self._rank_by_rating(self.genres[genre])
+
+    def remove(self, keep, df):
+        """
+        Drop movies from the index and renumber the remaining rows
+
+        Removed keys stay in the value arrays and are skipped on lookup;
+        once they outnumber the live movies the index is rebuilt from df.
+
+        Args:
+            keep (np.ndarray): Boolean mask over current rows, False for
+                the movies being removed
+            df (pd.DataFrame): Catalog after the removal
+        """
+        self.keys.remove(keep)
+        if self.keys.n_removed > len(self.keys):
+            self.__init__(df)
+
+    @staticmethod
+    def _explode(series):
+        """Flatten a column of lists into parallel (row, value) arrays"""
+        lengths = series.map(len).to_numpy()
+        rows = np.repeat(np.arange(len(series), dtype=np.int32), lengths)
+        values = np.fromiter(chain.from_iterable(series), dtype=object, count=lengths.sum())
+        return rows, values
+
+    @staticmethod
+    def _group(rows, values):
+        """Map each distinct value to the rows holding it, in catalog order"""
+        if len(values) == 0:
+            return {}
+        groups = pd.Series(rows).groupby(values, sort=False).indices
+        return {value: np.unique(rows[positions]) for value, positions in groups.items()}
+
+    @staticmethod
+    def _extend(index, groups):
+        """Append new keys to each value's array; returns the values touched"""
+        for value, keys in groups.items():
+            existing = index.get(value)
+            index[value] = keys if existing is None else np.concatenate([existing, keys])
+        return list(groups)
+
+    def _rank_by_rating(self, keys):
+        ratings = self.vote_average[keys]
+        rated = ~np.isnan(ratings)
+        keys, ratings = keys[rated], ratings[rated]
+        return keys[np.argsort(-ratings, kind='stable')]
+
+    def _rows(self, index, value):
+        return self.keys.rows(index.get(value, np.empty(0, dtype=np.int64)))
+
+    def rows_for_genre(self, genre):
+        """Rows of movies in a genre, in catalog order"""
+        return self._rows(self.genres, genre)
+
+    def rows_for_director(self, director):
+        """Rows of movies by a director, in catalog order"""
+        return self._rows(self.directors, director)
+
+    def rows_for_actor(self, actor):
+        """Rows of movies with an actor in the main cast, in catalog order"""
+        return self._rows(self.cast, actor)
+
+    def top_rated(self, genre, n=5):
+        """Rows of the n highest rated movies in a genre"""
+        # Removed keys can only push live ones back by n_removed places
+        ranked = self.top_rated_by_genre.get(genre, np.empty(0, dtype=np.int64))
+        return self.keys.rows(ranked[:n + self.keys.n_removed])[:n]
@@ -7,14 +7,26 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from data_loader import MovieDataLoader
 from eda import MovieEDA
 from feature_engineering import FeatureEngineer
+from instrumentation import INSTRUMENTATION
 from recommender import MovieRecommender
 
+DATA_PATH = "C:/Users/512GB/OneDrive/Documents/Company tasks/data/movies.csv"
+ARTIFACT_DIR = "Outputs/model"
+CACHE_PATH = "Outputs/movies_cache.parquet"
+PROCESSED_PATH = "Outputs/processed_movies.parquet"
+# Written when MOVIES_INSTRUMENT=1, see instrumentation.Instrumentation.configure_from_env
+INSTRUMENTATION_REPORT = "Outputs/instrumentation.json"
+
 def main():
+    INSTRUMENTATION.configure_from_env()
+    
     # Step 1: Load Data
     print("Step 1: Loading Data...")
-    data_loader = MovieDataLoader("C:/Users/512GB/OneDrive/Documents/Company tasks/data/movies.csv")  
-    df = data_loader.load_data()
-    print(f"Loaded {len(df)} movies")
+    data_loader = MovieDataLoader(DATA_PATH)
+    # Only rows that are new or changed since the last run are recleaned
+    with INSTRUMENTATION.stage('load'):
+        df = data_loader.refresh_cache(CACHE_PATH)
+    print(f"Loaded {len(df)} movies ({data_loader.refresh_stats})")
     #print(f"Duplicates? {df.duplicated().sum()} movies")
 
     # Step 2: Exploratory Data Analysis
@@ -22,29 +34,33 @@ def main():
     eda = MovieEDA(df)
     
     # Generate and print basic stats
-    basic_stats = eda.generate_basic_stats()
+    with INSTRUMENTATION.stage('eda'):
+        basic_stats = eda.generate_basic_stats()
     print("Basic Statistics:")
     for key, value in basic_stats.items():
         print(f"{key}: {value}")
     
     # Generate visualizations
     print("\nGenerating Visualizations...")
-    genre_plot = eda.plot_genre_distribution('Outputs/genre_distribution.png')
-    budget_revenue_plot = eda.plot_budget_revenue_correlation('Outputs/budget_revenue_correlation.png')
+    with INSTRUMENTATION.stage('plots'):
+        genre_plot = eda.plot_genre_distribution('Outputs/genre_distribution.png')
+        budget_revenue_plot = eda.plot_budget_revenue_correlation('Outputs/budget_revenue_correlation.png')
     print("Visualizations saved in 'outputs/' directory")
 
     # Step 3: Feature Engineering
     print("\nStep 3: Feature Engineering...")
-    engineer = FeatureEngineer(df)
-    df_processed = engineer.create_combined_features()
-    df_processed = engineer.encode_categorical_features()
-    df_processed = engineer.normalize_numeric_features()
+    with INSTRUMENTATION.stage('features'):
+        engineer = FeatureEngineer(df)
+        df_processed = engineer.create_combined_features()
+        df_processed = engineer.encode_categorical_features()
+        df_processed = engineer.normalize_numeric_features()
     print("Feature engineering completed")
 
     # Step 4: Build Recommendation System
     print("\nStep 4: Building Recommendation System...")
-    recommender = MovieRecommender(df_processed)
-    recommender.build_content_based_model()
+    # Reuses the saved model artifact unless the source CSV has changed
+    with INSTRUMENTATION.stage('model'):
+        recommender = MovieRecommender.load_or_build(DATA_PATH, ARTIFACT_DIR, df=df_processed)
     
     # Example: Get recommendations for a movie
     try:
@@ -57,8 +73,13 @@ def main():
 
     # Step 5: Save Processed Data 
     print("\nStep 5: Saving Processed Data...")
-    df_processed.to_csv('Outputs/processes_movies.csv', index=False)
-    print("Processed data saved to 'Outputs/processes_movies.csv'")
+    with INSTRUMENTATION.stage('save'):
+        data_loader.save_cache(df_processed, PROCESSED_PATH)
+    print(f"Processed data saved to '{PROCESSED_PATH}'")
+    
+    if INSTRUMENTATION.enabled:
+        INSTRUMENTATION.to_json(INSTRUMENTATION_REPORT)
+        print(f"Instrumentation report saved to '{INSTRUMENTATION_REPORT}'")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
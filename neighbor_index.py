@@ -0,0 +1,220 @@
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+
+def top_k_indices(scores, k):
+    """
+    Select the top-k columns of each row, best first
+
+    Ties are broken by ascending column index, which reproduces a stable
+    descending sort of the full row without paying for it.
+
+    Args:
+        scores (np.ndarray): 2D array of scores, one row per query
+        k (int): Number of columns to keep per row
+
+    Returns:
+        np.ndarray: int64 array of shape (rows, min(k, columns))
+    """
+    scores = np.atleast_2d(scores)
+    n_rows, n_cols = scores.shape
+    k = max(0, min(k, n_cols))
+    if k == 0:
+        return np.empty((n_rows, 0), dtype=np.int64)
+
+    if k < n_cols:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+
+        # argpartition picks arbitrarily among values tied at the boundary,
+        # so redo those rows keeping the lowest indices of the tied value
+        threshold = candidate_scores.min(axis=1)
+        tied_rows = np.flatnonzero(
+            (scores >= threshold[:, None]).sum(axis=1) > k
+        )
+        for row in tied_rows:
+            above = np.flatnonzero(scores[row] > threshold[row])
+            at = np.flatnonzero(scores[row] == threshold[row])
+            candidates[row] = np.concatenate([above, at[:k - len(above)]])
+            candidate_scores[row] = scores[row, candidates[row]]
+    else:
+        candidates = np.broadcast_to(np.arange(n_cols), (n_rows, n_cols))
+        candidate_scores = scores
+
+    order = np.lexsort((candidates, -candidate_scores), axis=-1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+class NeighborIndex:
+    def __init__(self, k=50, block_size=256):
+        """
+        Initialize a top-k cosine neighbor index
+
+        Args:
+            k (int): Number of neighbors kept per movie
+            block_size (int): Rows scored at once; peak memory is roughly
+                block_size x n_movies x 8 bytes
+        """
+        self.k = k
+        self.block_size = block_size
+        self.indices = None
+        self.scores = None
+
+    def build(self, feature_matrix, backend=None):
+        """
+        Compute each row's nearest neighbors block by block
+
+        A movie is never listed as its own neighbor.
+
+        Args:
+            feature_matrix (scipy.sparse.csr_matrix): TF-IDF matrix
+            backend (optional): Similarity backend to query instead of
+                scoring exact cosine blocks, e.g. ApproximateCosineBackend;
+                rows it returns fewer than k neighbors for are padded with -1
+
+        Returns:
+            NeighborIndex: The fitted index
+        """
+        n_rows = feature_matrix.shape[0]
+        width = max(0, min(self.k, n_rows - 1))
+        self.indices = np.empty((n_rows, width), dtype=np.int32)
+        self.scores = np.empty((n_rows, width), dtype=np.float32)
+
+        for start in range(0, n_rows, self.block_size):
+            stop = min(start + self.block_size, n_rows)
+            self.indices[start:stop], self.scores[start:stop] = self._score_rows(
+                feature_matrix, np.arange(start, stop), width, backend
+            )
+
+        return self
+
+    @staticmethod
+    def _score_rows(feature_matrix, rows, width, backend=None):
+        """Top-width neighbors of some rows, from the backend or exact cosine"""
+        if backend is not None:
+            return backend.query_rows(rows, width)
+        block = cosine_similarity(feature_matrix[rows], feature_matrix)
+        block[np.arange(len(rows)), rows] = -np.inf
+        block_indices = top_k_indices(block, width)
+        return block_indices, np.take_along_axis(block, block_indices, axis=1)
+
+    def add_rows(self, feature_matrix, n_existing):
+        """
+        Extend the index with rows appended to the feature matrix
+
+        Only the new rows are scored, against the whole matrix. Their
+        neighbor lists are computed exactly, and each existing list is
+        patched in place where a new movie beats its current k-th score.
+
+        Args:
+            feature_matrix (scipy.sparse.csr_matrix): TF-IDF matrix whose
+                rows from n_existing on are new
+            n_existing (int): Rows already in the index
+
+        Returns:
+            NeighborIndex: The updated index
+        """
+        n_rows = feature_matrix.shape[0]
+        self._make_writable()
+        self._widen(max(0, min(self.k, n_rows - 1)))
+        width = self.indices.shape[1]
+        self.indices = np.vstack([self.indices, np.full((n_rows - n_existing, width), -1, dtype=np.int32)])
+        self.scores = np.vstack([self.scores, np.full((n_rows - n_existing, width), -np.inf, dtype=np.float32)])
+
+        for start in range(n_existing, n_rows, self.block_size):
+            rows = np.arange(start, min(start + self.block_size, n_rows))
+            block = cosine_similarity(feature_matrix[rows], feature_matrix)
+            block[np.arange(len(rows)), rows] = -np.inf
+            block_indices = top_k_indices(block, width)
+            self.indices[rows] = block_indices
+            self.scores[rows] = np.take_along_axis(block, block_indices, axis=1)
+
+            # Existing movies whose lists the new block can change
+            candidates = block[:, :n_existing].T
+            threshold = np.where(self.indices[:n_existing, -1] >= 0,
+                                 self.scores[:n_existing, -1], -np.inf) if width else np.inf
+            affected = np.flatnonzero(candidates.max(axis=1, initial=-np.inf) > threshold)
+            if len(affected):
+                self._merge(affected, np.broadcast_to(rows, (len(affected), len(rows))),
+                            candidates[affected])
+
+        return self
+
+    def remove_rows(self, keep, feature_matrix, backend=None):
+        """
+        Drop rows from the index and renumber the rest
+
+        Lists that referenced a removed movie are recomputed against the
+        remaining rows; all other lists are only renumbered.
+
+        Args:
+            keep (np.ndarray): Boolean mask over the old rows, True to keep
+            feature_matrix (scipy.sparse.csr_matrix): TF-IDF matrix of the
+                kept rows
+            backend (optional): Similarity backend to query for recomputed
+                lists instead of exact cosine, as in build
+
+        Returns:
+            NeighborIndex: The updated index
+        """
+        new_positions = np.cumsum(keep) - 1
+        new_positions[~keep] = -1
+        indices = np.asarray(self.indices)[keep]
+        valid = indices >= 0
+        remapped = np.where(valid, new_positions[np.maximum(indices, 0)], -1).astype(np.int32)
+        stale = (valid & (remapped < 0)).any(axis=1)
+
+        width = max(0, min(self.k, feature_matrix.shape[0] - 1))
+        self.indices = remapped[:, :width]
+        self.scores = np.array(self.scores[keep][:, :width])
+
+        stale_rows = np.flatnonzero(stale)
+        for start in range(0, len(stale_rows), self.block_size):
+            rows = stale_rows[start:start + self.block_size]
+            self.indices[rows], self.scores[rows] = self._score_rows(feature_matrix, rows, width, backend)
+
+        return self
+
+    def _merge(self, rows, candidate_indices, candidate_scores):
+        """Merge candidate neighbors into the lists of some rows"""
+        width = self.indices.shape[1]
+        current = self.indices[rows]
+        merged_indices = np.hstack([current, candidate_indices])
+        # Candidates are rounded to the stored float32 first, so exact ties
+        # with existing entries stay ties and the lower row wins, as in build
+        merged_scores = np.hstack([
+            np.where(current >= 0, self.scores[rows], -np.inf), candidate_scores.astype(np.float32)
+        ])
+
+        # Lists are ordered by score then row, and candidates have higher
+        # rows than every existing entry, so ties by column keep that order
+        top = top_k_indices(merged_scores, width)
+        self.indices[rows] = np.take_along_axis(merged_indices, top, axis=1)
+        self.scores[rows] = np.take_along_axis(merged_scores, top, axis=1)
+
+    def _make_writable(self):
+        """Copy memory-mapped, read-only arrays before patching them"""
+        if not self.indices.flags.writeable:
+            self.indices = np.array(self.indices)
+        if not self.scores.flags.writeable:
+            self.scores = np.array(self.scores)
+
+    def _widen(self, width):
+        """Pad lists with empty slots when the catalog has outgrown them"""
+        extra = width - self.indices.shape[1]
+        if extra > 0:
+            self.indices = np.hstack([self.indices, np.full((len(self.indices), extra), -1, dtype=np.int32)])
+            self.scores = np.hstack([self.scores, np.full((len(self.scores), extra), -np.inf, dtype=np.float32)])
+
+    def neighbors(self, rows, n):
+        """
+        Get the n closest movies to one or more rows
+
+        Args:
+            rows (int or array-like): Row positions of the query movies
+            n (int): Number of neighbors to return, at most k
+
+        Returns:
+            tuple: (indices, scores) arrays
+        """
+        return self.indices[rows, :n], self.scores[rows, :n]
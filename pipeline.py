@@ -0,0 +1,46 @@
+import hashlib
+
+from data_loader import MovieDataLoader
+from feature_engineering import FeatureEngineer
+
+
+def load_processed_data(file_path, compact=False):
+    """
+    Load the raw catalog and run every feature engineering step
+
+    Args:
+        file_path (str): Path to the movies CSV file
+        compact (bool): Also run FeatureEngineer.compact_features
+
+    Returns:
+        pd.DataFrame: Feature-engineered movie dataset
+    """
+    data_loader = MovieDataLoader(file_path)
+    df = data_loader.load_data()
+
+    engineer = FeatureEngineer(df)
+    df = engineer.create_combined_features()
+    df = engineer.encode_categorical_features()
+    df = engineer.normalize_numeric_features()
+    if compact:
+        df = engineer.compact_features()
+
+    return df
+
+
+def file_fingerprint(file_path, chunk_size=1 << 20):
+    """
+    SHA-256 hex digest of a file's contents
+
+    Args:
+        file_path (str): File to hash
+        chunk_size (int): Bytes read per iteration
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,451 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from catalog_filters import CatalogFilter
+from instrumentation import INSTRUMENTATION, METRIC_PREFIX, LatencyHistogram
+from recommender import MovieRecommender
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1 << 20
+PROFILE_METHODS = ('centroid', 'neighbors')
+
+
+class MicroBatcher:
+    """
+    Collect concurrent requests and process them as one batch
+
+    A batch is processed once max_batch_size requests are waiting or
+    max_wait_ms after the first one arrived, whichever comes first. The
+    process function runs in the given executor so the event loop keeps
+    accepting requests meanwhile.
+    """
+
+    def __init__(self, process, executor, max_batch_size=64, max_wait_ms=2.0):
+        """
+        Args:
+            process (callable): Takes a list of requests, returns a list of
+                results in the same order
+            executor (concurrent.futures.Executor): Where process runs
+            max_batch_size (int): Requests per batch
+            max_wait_ms (float): Longest a request waits for others
+        """
+        self.process = process
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batch_sizes = LatencyHistogram(buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+        self._pending = []
+        self._timer = None
+        # Running batches, referenced so they are not garbage collected
+        self._running = set()
+
+    async def submit(self, request):
+        """Queue a request and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((request, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch):
+        self.batch_sizes.observe(len(batch))
+        loop = asyncio.get_running_loop()
+        requests = [request for request, _ in batch]
+        try:
+            results = await loop.run_in_executor(self.executor, self.process, requests)
+        except Exception as e:
+            if len(batch) == 1:
+                self._settle(batch[0][1], error=e)
+                return
+            # Retry one by one so a bad request only fails itself
+            for request, future in batch:
+                try:
+                    result, = await loop.run_in_executor(self.executor, self.process, [request])
+                except Exception as e:
+                    self._settle(future, error=e)
+                else:
+                    self._settle(future, result)
+            return
+        for (_, future), result in zip(batch, results):
+            self._settle(future, result)
+
+    @staticmethod
+    def _settle(future, result=None, error=None):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class RecommendationService:
+    """
+    JSON-over-HTTP recommendation service built on asyncio
+
+    Endpoints:
+        GET  /health             Liveness and catalog size
+        GET  /metrics            Latency histograms and batch sizes;
+                                 format=prometheus for the text format
+        GET|POST /similar        title (and year) or id, n, ranking,
+                                 weights, filters
+        GET  /popular            genre, n
+        POST /profile            history, n, method, filters
+
+    GET parameters come from the query string, with weights and filters
+    as JSON strings; POST parameters come from a JSON body. Model work
+    runs on one background thread, fed by micro-batches.
+    """
+
+    def __init__(self, recommender, max_concurrency=64, queue_timeout=1.0, max_batch_size=64,
+                 max_wait_ms=2.0, keepalive_timeout=15.0):
+        """
+        Args:
+            recommender (MovieRecommender): Fitted recommender
+            max_concurrency (int): Requests processed at once
+            queue_timeout (float): Seconds a request may wait for a slot
+                before it is rejected with 503
+            max_batch_size (int): Requests per micro-batch
+            max_wait_ms (float): Longest a request waits to be batched
+            keepalive_timeout (float): Seconds an idle connection is kept
+        """
+        self.recommender = recommender
+        self.queue_timeout = queue_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recommender')
+        self.similar_batcher = MicroBatcher(recommender.get_recommendations_many, self.executor,
+                                            max_batch_size, max_wait_ms)
+        self.profile_batcher = MicroBatcher(self._profiles, self.executor, max_batch_size, max_wait_ms)
+        self.latency = {}
+        self.rejected = 0
+        self._max_concurrency = max_concurrency
+        self._slots = None
+        self.routes = {
+            ('GET', '/health'): self.health,
+            ('GET', '/metrics'): self.metrics,
+            ('GET', '/similar'): self.similar,
+            ('POST', '/similar'): self.similar,
+            ('GET', '/popular'): self.popular,
+            ('POST', '/profile'): self.profile,
+        }
+
+    async def start(self, host='127.0.0.1', port=8000):
+        """
+        Start listening
+
+        Returns:
+            asyncio.AbstractServer: The running server
+        """
+        self._slots = asyncio.Semaphore(self._max_concurrency)
+        return await asyncio.start_server(self._serve_connection, host, port)
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), self.keepalive_timeout)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                keep_alive = await self._serve_request(request_line, reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # Dropped connection or a malformed request line
+            pass
+        finally:
+            writer.close()
+
+    async def _serve_request(self, request_line, reader, writer):
+        start = time.perf_counter()
+        method, target, version = request_line.decode('latin-1').split(maxsplit=2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = headers.get('connection', '').lower() != 'close' and version.strip() == 'HTTP/1.1'
+
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        try:
+            length = int(headers.get('content-length', 0))
+            if length > MAX_BODY_BYTES:
+                raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+            body = await reader.readexactly(length) if length else b''
+            if handler is None:
+                known = any(path == url.path for _, path in self.routes)
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED if known else HTTPStatus.NOT_FOUND,
+                                f"No route for {method} {url.path}")
+            params = self._parse_params(url.query, body)
+            status, payload = HTTPStatus.OK, await self._limited(handler, params)
+        except HTTPError as e:
+            status, payload = e.status, {'error': e.message}
+        except (ValueError, TypeError, KeyError) as e:
+            status, payload = HTTPStatus.BAD_REQUEST, {'error': str(e)}
+        except Exception:
+            logger.exception(f"Failed to serve {method} {url.path}")
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "Internal server error"}
+
+        if isinstance(payload, str):
+            data, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            data, content_type = json.dumps(_json_safe(payload)).encode('utf-8'), 'application/json'
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+        )
+
+        if handler is not None:
+            histogram = self.latency.setdefault(url.path, LatencyHistogram())
+            histogram.observe((time.perf_counter() - start) * 1000, error=status.value >= 400)
+        return keep_alive
+
+    @staticmethod
+    def _parse_params(query, body):
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        for key in ('weights', 'filters', 'history'):
+            if isinstance(params.get(key), str):
+                params[key] = json.loads(params[key])
+        if body:
+            payload = json.loads(body)
+            if not isinstance(payload, dict):
+                raise ValueError("Request body must be a JSON object")
+            params.update(payload)
+        return params
+
+    async def _limited(self, handler, params):
+        """Run a handler within the concurrency limit"""
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Too many concurrent requests")
+        try:
+            return await handler(params)
+        finally:
+            self._slots.release()
+
+    async def health(self, params):
+        return {'status': 'ok', 'movies': len(self.recommender.df)}
+
+    async def metrics(self, params):
+        if params.get('format') == 'prometheus':
+            return self._prometheus_metrics()
+        return {
+            'endpoints': {path: histogram.snapshot() for path, histogram in self.latency.items()},
+            'batch_sizes': {
+                'similar': self.similar_batcher.batch_sizes.snapshot(),
+                'profile': self.profile_batcher.batch_sizes.snapshot()
+            },
+            'rejected': self.rejected,
+            'result_cache': getattr(self.recommender.result_cache, 'stats', None),
+            'instrumentation': INSTRUMENTATION.report() if INSTRUMENTATION.enabled else None
+        }
+
+    def _prometheus_metrics(self):
+        """Service metrics plus the instrumentation report as Prometheus text"""
+        lines = [f"# TYPE {METRIC_PREFIX}_http_latency_ms histogram"]
+        for path, histogram in self.latency.items():
+            lines.extend(histogram.prometheus_lines(f"{METRIC_PREFIX}_http_latency_ms", {'path': path}))
+        lines.append(f"# TYPE {METRIC_PREFIX}_http_errors_total counter")
+        lines.extend(
+            f'{METRIC_PREFIX}_http_errors_total{{path="{path}"}} {histogram.errors}'
+            for path, histogram in self.latency.items()
+        )
+        lines.append(f"# TYPE {METRIC_PREFIX}_batch_size histogram")
+        for name, batcher in (('similar', self.similar_batcher), ('profile', self.profile_batcher)):
+            lines.extend(
+                batcher.batch_sizes.prometheus_lines(f"{METRIC_PREFIX}_batch_size", {'batcher': name})
+            )
+        lines.append(f"# TYPE {METRIC_PREFIX}_http_rejected_total counter")
+        lines.append(f"{METRIC_PREFIX}_http_rejected_total {self.rejected}")
+        return '\n'.join(lines) + '\n' + (INSTRUMENTATION.to_prometheus() if INSTRUMENTATION.enabled else '')
+
+    async def similar(self, params):
+        if 'title' in params:
+            request = {'title': str(params['title'])}
+            if params.get('year') is not None:
+                request['year'] = int(params['year'])
+        elif 'id' in params:
+            request = {'id': int(params['id'])}
+        else:
+            raise ValueError("Pass a title or an id")
+        request['n'] = _count(params.get('n', 5))
+        if params.get('n_probes') is not None:
+            request['n_probes'] = int(params['n_probes'])
+        for key in ('ranking', 'weights', 'filters'):
+            if params.get(key) is not None:
+                request[key] = params[key]
+        # Reject bad options here with a 400 instead of inside the batch
+        self.recommender.validate_ranking(request.get('ranking', 'similarity'), request.get('weights'))
+        CatalogFilter.normalize(request.get('filters'))
+
+        result = await self.similar_batcher.submit(request)
+        if isinstance(result, str):
+            raise HTTPError(HTTPStatus.NOT_FOUND, result)
+        return {'results': result}
+
+    async def popular(self, params):
+        if 'genre' not in params:
+            raise ValueError("Pass a genre")
+        # Served from the precomputed genre rankings, too cheap to batch
+        return {'results': self.recommender.get_popular_in_genre(params['genre'], _count(params.get('n', 5)))}
+
+    async def profile(self, params):
+        method = params.get('method', 'centroid')
+        if method not in PROFILE_METHODS:
+            raise ValueError(f"Unknown profile method: {method}")
+        request = {
+            'history': _history(params.get('history')),
+            'n': _count(params.get('n', 10)),
+            'method': method,
+            'filters': params.get('filters')
+        }
+        CatalogFilter.normalize(request['filters'])
+        result = await self.profile_batcher.submit(request)
+        if isinstance(result, str):
+            raise HTTPError(HTTPStatus.NOT_FOUND, result)
+        return {'results': result}
+
+    def _profiles(self, requests):
+        """Profile requests grouped by options, one batch call per group"""
+        results = [None] * len(requests)
+        groups = {}
+        for pos, request in enumerate(requests):
+            options = (request['n'], request['method'], json.dumps(request['filters'], sort_keys=True))
+            groups.setdefault(options, []).append(pos)
+        for positions in groups.values():
+            first = requests[positions[0]]
+            group_results = self.recommender.get_profile_recommendations_batch(
+                [requests[pos]['history'] for pos in positions],
+                n=first['n'], method=first['method'], filters=first['filters']
+            )
+            for pos, result in zip(positions, group_results):
+                results[pos] = result
+        return results
+
+
+def _count(value, limit=100):
+    """Parse a result count, capped to keep responses small"""
+    value = int(value)
+    if not 1 <= value <= limit:
+        raise ValueError(f"n must be between 1 and {limit}")
+    return value
+
+
+def _history(value):
+    """Parse a watch history into (title or id, weight) pairs, rejecting malformed entries"""
+    if isinstance(value, dict):
+        value = list(value.items())
+    if not isinstance(value, list):
+        raise ValueError("Pass a history list of titles or ids, or [item, weight] pairs")
+    history = []
+    for entry in value:
+        if isinstance(entry, (list, tuple)):
+            if len(entry) != 2:
+                raise ValueError(f"History pairs must be [item, weight], got {entry!r}")
+            item, weight = entry
+        else:
+            item, weight = entry, 1.0
+        if isinstance(item, bool) or not isinstance(item, (str, int)):
+            raise ValueError(f"History items must be titles or ids, got {item!r}")
+        weight = float(weight)
+        if not math.isfinite(weight):
+            raise ValueError(f"History weights must be finite, got {weight}")
+        history.append((item, weight))
+    return history
+
+
+def _json_safe(value):
+    """Replace NaN and infinities, which JSON cannot represent, with null"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    if hasattr(value, 'item'):
+        return _json_safe(value.item())
+    if hasattr(value, 'tolist'):
+        return _json_safe(value.tolist())
+    return value
+
+
+async def serve(recommender, host='127.0.0.1', port=8000, **service_options):
+    """Run the service until cancelled"""
+    service = RecommendationService(recommender, **service_options)
+    server = await service.start(host, port)
+    logger.info(f"Serving recommendations on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve movie recommendations over HTTP")
+    parser.add_argument('--artifact-dir', default='Outputs/model')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-concurrency', type=int, default=64)
+    parser.add_argument('--batch-size', type=int, default=64, help="Requests per micro-batch")
+    parser.add_argument('--batch-wait-ms', type=float, default=2.0, help="Longest wait to fill a batch")
+    parser.add_argument('--cache-size', type=int, default=4096, help="Result cache entries, 0 to disable")
+    parser.add_argument('--instrument', action='store_true',
+                        help="Record per-query latency and stage timings, reported by /metrics")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+    if args.instrument:
+        INSTRUMENTATION.enable()
+
+    recommender = MovieRecommender.load(args.artifact_dir)
+    if args.cache_size:
+        recommender.enable_result_cache(max_entries=args.cache_size)
+
+    try:
+        asyncio.run(serve(recommender, args.host, args.port, max_concurrency=args.max_concurrency,
+                          max_batch_size=args.batch_size, max_wait_ms=args.batch_wait_ms))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,1054 @@
+import json
+import math
+import os
+import pickle
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+from neighbor_index import NeighborIndex, top_k_indices
+from catalog_filters import CatalogFilter
+from feature_engineering import FeatureEngineer
+from hybrid_scoring import HYBRID_WEIGHTS, HybridScorer
+from instrumentation import INSTRUMENTATION, timed
+from inverted_index import InvertedIndex
+from pipeline import file_fingerprint, load_processed_data
+from result_cache import ResultCache
+from similarity_backends import BACKENDS, make_backend
+from streaming_tfidf import DEFAULT_N_FEATURES, HashingTfidfVectorizer, stream_tfidf_matrix
+from title_index import TitleIndex
+
+# Bump whenever the on-disk artifact layout changes
+ARTIFACT_VERSION = 6
+
+# Raw nested columns that are not needed once derived fields exist
+CATALOG_BLOB_COLUMNS = ['genres', 'keywords', 'cast', 'crew']
+
+# Counters of incremental updates since the vectorizer was last fitted
+UPDATE_STATS = {'movies_added': 0, 'movies_removed': 0, 'tokens_added': 0, 'oov_tokens_added': 0}
 
 class MovieRecommender:
-    def __init__(self, df):
+    def __init__(self, df, title_index=None, inverted_index=None):
         self.df = df
+        self.title_index = title_index if title_index is not None else TitleIndex(df)
+        self.inverted_index = inverted_index if inverted_index is not None else InvertedIndex(df)
+        self.vectorizer = None
+        self.tfidf_matrix = None
         self.similarity_matrix = None
-        
-    def build_content_based_model(self):
-        """Build content-based recommendation system"""
-        tfidf = TfidfVectorizer(stop_words='english')
-        tfidf_matrix = tfidf.fit_transform(self.df['combined_features'].fillna(''))
-        self.similarity_matrix = cosine_similarity(tfidf_matrix)
-        
-    def get_recommendations(self, movie_title, n=5):
-        """Get movie recommendations based on title"""
-        try:
-            idx = self.df[self.df['title'] == movie_title].index[0]
-            sim_scores = list(enumerate(self.similarity_matrix[idx]))
-            sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-            sim_scores = sim_scores[1:n+1]
-            movie_indices = [i[0] for i in sim_scores]
-            
-            return self.df.iloc[movie_indices][
-                ['title', 'genre_names', 'vote_average', 'overview']
-            ].to_dict('records')
-        except IndexError:
-            return f"Movie '{movie_title}' not found in database."
-    
+        self.neighbor_index = None
+        self.backend = None
+        self.model_params = {}
+        # Identifies the fitted model, so cached results never outlive it
+        self.model_id = None
+        self.result_cache = None
+        # Signal weights and candidate over-fetch factor for ranking='hybrid'
+        self.hybrid_weights = dict(HYBRID_WEIGHTS)
+        self.hybrid_overfetch = 5
+        # Lookup structures derived from the catalog, rebuilt when it changes
+        self._derived = {}
+        # Bumped by every add_movies/remove_movies call
+        self.catalog_version = 0
+        self.update_stats = dict(UPDATE_STATS)
+
+    def build_content_based_model(self, mode='dense', k=50, block_size=256, backend='exact',
+                                  vectorizer='tfidf', n_features=DEFAULT_N_FEATURES):
+        """
+        Build content-based recommendation system
+
+        Args:
+            mode (str): 'dense' keeps the full N x N similarity matrix,
+                'neighbors' keeps only each movie's top-k neighbors,
+                'backend' precomputes nothing and queries the backend
+            k (int): Neighbors kept per movie in 'neighbors' mode
+            block_size (int): Rows scored at once in 'neighbors' mode
+            backend (str or object): Similarity backend, 'exact' or
+                'approximate', or a backend instance from similarity_backends
+            vectorizer (str): 'tfidf' learns a vocabulary; 'hashing' hashes
+                terms into n_features columns, see streaming_tfidf
+            n_features (int): Hash buckets for the 'hashing' vectorizer
+        """
+        if mode not in ('dense', 'neighbors', 'backend'):
+            raise ValueError(f"Unknown model mode: {mode}")
+
+        if vectorizer not in ('tfidf', 'hashing'):
+            raise ValueError(f"Unknown vectorizer: {vectorizer}")
+
+        texts = self.df['combined_features'].fillna('')
+        with INSTRUMENTATION.stage('model.vectorize'):
+            if vectorizer == 'tfidf':
+                self.vectorizer = TfidfVectorizer(stop_words='english')
+                self.tfidf_matrix = self.vectorizer.fit_transform(texts)
+            else:
+                self.vectorizer = HashingTfidfVectorizer(n_features=n_features)
+                counts = self.vectorizer.count(texts)
+                self.tfidf_matrix = self.vectorizer.partial_fit(counts).finalize().weight(counts)
+        self._build_similarity(mode, k, block_size, backend)
+
+    def build_streaming_model(self, text_chunks, matrix_dir, mode='neighbors', k=50, block_size=256,
+                              backend='exact', n_features=DEFAULT_N_FEATURES):
+        """
+        Build the model from documents streamed in chunks
+
+        The TF-IDF matrix is built with a hashing vectorizer and written to
+        matrix_dir, then memory-mapped, so the corpus never has to be in
+        memory at once; see streaming_tfidf.stream_tfidf_matrix.
+
+        Args:
+            text_chunks (iterable): Chunks of 'combined_features' in catalog
+                row order, e.g. streaming_tfidf.iter_csv_features
+            matrix_dir (str): Working directory for the matrix files
+            mode (str): Model mode, 'neighbors' or 'backend' at this scale
+            k (int): Neighbors kept per movie in 'neighbors' mode
+            block_size (int): Rows scored at once in 'neighbors' mode
+            backend (str or object): Similarity backend
+            n_features (int): Hash buckets
+        """
+        if mode not in ('dense', 'neighbors', 'backend'):
+            raise ValueError(f"Unknown model mode: {mode}")
+
+        with INSTRUMENTATION.stage('model.vectorize'):
+            self.vectorizer, self.tfidf_matrix = stream_tfidf_matrix(text_chunks, matrix_dir, n_features)
+        if self.tfidf_matrix.shape[0] != len(self.df):
+            raise ValueError(
+                f"Streamed {self.tfidf_matrix.shape[0]} documents for a catalog of {len(self.df)} movies"
+            )
+        self._build_similarity(mode, k, block_size, backend)
+
+    def _build_similarity(self, mode, k, block_size, backend):
+        """Fit the backend and precompute similarities for a vectorized catalog"""
+        with INSTRUMENTATION.stage('model.backend'):
+            self.backend = make_backend(backend).build(self.tfidf_matrix)
+        self.model_params = {'mode': mode, 'k': k, 'block_size': block_size, 'backend': self.backend.name,
+                             'vectorizer': 'hashing' if self._is_hashing() else 'tfidf'}
+        self.similarity_matrix = None
+        self.neighbor_index = None
+        self.update_stats = dict(UPDATE_STATS)
+        self.model_id = uuid.uuid4().hex
+
+        if mode == 'dense':
+            if self.backend.name != 'exact':
+                raise ValueError("'dense' mode requires the exact backend")
+            with INSTRUMENTATION.stage('model.similarity'):
+                self.similarity_matrix = cosine_similarity(self.tfidf_matrix)
+        elif mode == 'neighbors':
+            self.neighbor_index = NeighborIndex(k=k, block_size=block_size)
+            with INSTRUMENTATION.stage('model.neighbors'):
+                self.neighbor_index.build(
+                    self.tfidf_matrix, backend=self.backend if self.backend.name != 'exact' else None
+                )
+
+    def _is_hashing(self):
+        return isinstance(self.vectorizer, HashingTfidfVectorizer)
+
+    def add_movies(self, new_df):
+        """
+        Add movies to a fitted model without refitting it
+
+        New rows are vectorized with the existing vocabulary and IDF
+        weights and scored only against the current matrix; existing
+        neighbor lists are patched where a new movie makes the top k.
+        Words the vocabulary lacks are ignored, see vocabulary_drift for
+        when a full rebuild is due.
+
+        Args:
+            new_df (pd.DataFrame): Cleaned movies with the catalog's
+                columns; 'combined_features' is created if missing, and the
+                rows are compacted and cast to the catalog's dtypes as needed
+
+        Returns:
+            np.ndarray: Row positions of the added movies
+        """
+        if self.vectorizer is None:
+            raise ValueError("Build or load the model before adding movies")
+        if 'id' in new_df.columns and 'id' in self.df.columns:
+            known = [movie_id for movie_id in new_df['id'] if self.title_index.lookup_id(movie_id) is not None]
+            if known:
+                raise ValueError(f"Movies already in the catalog: {known[:5]}")
+        if 'combined_features' not in new_df.columns:
+            new_df = FeatureEngineer(new_df).create_combined_features()
+        new_df = self._conform_new_rows(new_df)
+
+        texts = new_df['combined_features'].fillna('')
+        analyzer = self.vectorizer.build_analyzer()
+        tokens = [token for text in texts for token in analyzer(text)]
+        self.update_stats['tokens_added'] += len(tokens)
+        if self._is_hashing():
+            self.update_stats['oov_tokens_added'] += self.vectorizer.unseen_terms(tokens)
+        else:
+            self.update_stats['oov_tokens_added'] += sum(token not in self.vectorizer.vocabulary_
+                                                         for token in tokens)
+
+        n_existing = self.tfidf_matrix.shape[0]
+        new_matrix = self.vectorizer.transform(texts)
+        self.tfidf_matrix = sparse.vstack([self.tfidf_matrix, new_matrix], format='csr')
+        attrs = {**self.df.attrs, **new_df.attrs}
+        self.df = pd.concat([self.df, new_df], ignore_index=True)
+        self.df.attrs = attrs
+        self.title_index.add(new_df)
+        self.inverted_index.add(new_df)
+        self.backend.add_rows(self.tfidf_matrix, n_existing)
+
+        if self.neighbor_index is not None:
+            self.neighbor_index.add_rows(self.tfidf_matrix, n_existing)
+        if self.similarity_matrix is not None:
+            n_rows = self.tfidf_matrix.shape[0]
+            new_scores = cosine_similarity(new_matrix, self.tfidf_matrix)
+            similarity = np.empty((n_rows, n_rows), dtype=new_scores.dtype)
+            similarity[:n_existing, :n_existing] = self.similarity_matrix
+            similarity[n_existing:] = new_scores
+            similarity[:n_existing, n_existing:] = new_scores[:, :n_existing].T
+            self.similarity_matrix = similarity
+
+        self.update_stats['movies_added'] += len(new_df)
+        self.catalog_version += 1
+        return np.arange(n_existing, n_existing + len(new_df))
+
+    def _conform_new_rows(self, new_df):
+        """
+        New rows in the catalog's layout, so appending them keeps its dtypes
+
+        A compacted catalog gets its new rows compacted the same way, with
+        genre_mask bits following the catalog's genre order. Columns the
+        catalog lacks are dropped, categoricals are extended with the new
+        values, and a column is only widened when new values do not fit.
+        """
+        if self.model_params.get('compact'):
+            engineer = FeatureEngineer(new_df)
+            engineer.genre_classes = self._genre_classes(new_df)
+            new_df = engineer.compact_features()
+
+        new_df = new_df.reindex(columns=self.df.columns)
+        for col, dtype in self.df.dtypes.items():
+            column = new_df[col]
+            if isinstance(dtype, pd.CategoricalDtype):
+                added = pd.Index(column.dropna().unique()).difference(dtype.categories)
+                if len(added):
+                    self.df[col] = self.df[col].cat.add_categories(added)
+                new_df[col] = column.astype(self.df[col].dtype)
+            elif pd.api.types.is_numeric_dtype(dtype) and pd.api.types.is_numeric_dtype(column):
+                if column.dtype == dtype:
+                    continue
+                values = column.to_numpy()
+                with np.errstate(invalid='ignore', over='ignore'):
+                    cast = values.astype(dtype)
+                if pd.api.types.is_float_dtype(dtype):
+                    fits = np.allclose(cast, values, rtol=1e-6, equal_nan=True)
+                else:
+                    fits = not np.isnan(values.astype(np.float64)).any() and np.array_equal(cast, values)
+                if not fits:
+                    dtype = np.result_type(dtype, column.dtype)
+                    self.df[col] = self.df[col].astype(dtype)
+                new_df[col] = column.astype(dtype)
+            elif column.dtype != dtype:
+                new_df[col] = column.astype(dtype)
+        return new_df
+
+    def _genre_classes(self, new_df):
+        """Genre order of the genre_mask bits, with new genres appended while bits remain"""
+        classes = self.df.attrs.get('genre_classes')
+        if classes is None:
+            classes = sorted({genre for genres in self.df['genre_names'] for genre in genres})
+        classes = list(classes)
+        n_bits = self.df['genre_mask'].dtype.itemsize * 8 if 'genre_mask' in self.df.columns else 64
+        for genre in sorted({genre for genres in new_df['genre_names'] for genre in genres} - set(classes)):
+            if len(classes) < n_bits:
+                classes.append(genre)
+        return classes
+
+    def remove_movies(self, movie_ids):
+        """
+        Remove movies from a fitted model without refitting it
+
+        Remaining rows are renumbered. Neighbor lists that pointed at a
+        removed movie are recomputed; all others are kept.
+
+        Args:
+            movie_ids (list): TMDB ids to remove; unknown ids are ignored
+
+        Returns:
+            int: Number of movies removed
+        """
+        rows = [self.title_index.lookup_id(movie_id) for movie_id in movie_ids]
+        rows = [row for row in rows if row is not None]
+        if not rows:
+            return 0
+
+        keep = np.ones(self.tfidf_matrix.shape[0], dtype=bool)
+        keep[rows] = False
+        self.tfidf_matrix = self.tfidf_matrix[keep]
+        self.df = self.df[keep].reset_index(drop=True)
+        self.title_index.remove(keep)
+        self.inverted_index.remove(keep, self.df)
+        self.backend.remove_rows(keep, self.tfidf_matrix)
+
+        if self.neighbor_index is not None:
+            self.neighbor_index.remove_rows(
+                keep, self.tfidf_matrix, backend=self.backend if self.backend.name != 'exact' else None
+            )
+        if self.similarity_matrix is not None:
+            self.similarity_matrix = np.asarray(self.similarity_matrix)[np.ix_(keep, keep)]
+
+        removed = int((~keep).sum())
+        self.update_stats['movies_removed'] += removed
+        self.catalog_version += 1
+        return removed
+
+    def vocabulary_drift(self, max_oov_rate=0.05, max_idf_change=0.05):
+        """
+        Measure how stale the fitted vocabulary and IDF weights have become
+
+        The out-of-vocabulary rate is the share of words in added movies
+        that the vectorizer ignored. IDF change compares the fitted
+        weights with those a refit on the current catalog would give,
+        averaged over terms weighted by how many movies use them.
+
+        Args:
+            max_oov_rate (float): OOV rate above which a refit is advised
+            max_idf_change (float): Mean relative IDF change above which a
+                refit is advised
+
+        Returns:
+            dict: Update counts, oov_rate, idf_mean_change,
+                idf_max_change and needs_refit
+        """
+        n_movies = self.tfidf_matrix.shape[0]
+        document_frequency = np.bincount(self.tfidf_matrix.indices, minlength=self.tfidf_matrix.shape[1])
+        used = document_frequency > 0
+
+        # TfidfVectorizer's smoothed IDF
+        current_idf = np.log((1 + n_movies) / (1 + document_frequency)) + 1
+        change = np.abs(current_idf - self.vectorizer.idf_) / self.vectorizer.idf_
+        idf_mean_change = float(np.average(change[used], weights=document_frequency[used])) if used.any() else 0.0
+        idf_max_change = float(change[used].max()) if used.any() else 0.0
+
+        tokens = self.update_stats['tokens_added']
+        oov_rate = self.update_stats['oov_tokens_added'] / tokens if tokens else 0.0
+        return {
+            'movies_added': self.update_stats['movies_added'],
+            'movies_removed': self.update_stats['movies_removed'],
+            'oov_rate': oov_rate,
+            'idf_mean_change': idf_mean_change,
+            'idf_max_change': idf_max_change,
+            'needs_refit': oov_rate > max_oov_rate or idf_mean_change > max_idf_change
+        }
+
+    def data_version(self):
+        """Identifier of the fitted model and catalog, changed by any update"""
+        return f'{self.model_id}.{self.catalog_version}'
+
+    def enable_result_cache(self, max_entries=1024, ttl=None, disk_dir=None):
+        """
+        Cache recommendation results
+
+        Results are keyed by query, n and search options, and are
+        invalidated automatically when the model or catalog changes.
+        Counters are in result_cache.stats.
+
+        Args:
+            max_entries (int): In-process LRU capacity
+            ttl (float, optional): Seconds before an entry expires
+            disk_dir (str, optional): Directory of a shared on-disk level,
+                for several app processes serving the same model
+
+        Returns:
+            ResultCache: The cache
+        """
+        self.result_cache = ResultCache(max_entries=max_entries, ttl=ttl, disk_dir=disk_dir)
+        return self.result_cache
+
+    @timed('get_recommendations')
+    def get_recommendations(self, movie_title, n=5, year=None, n_probes=None, ranking='similarity',
+                            weights=None, filters=None):
+        """
+        Get movie recommendations based on title
+
+        Args:
+            movie_title (str): Title of the query movie
+            n (int): Number of recommendations
+            year (int, optional): Release year to pick between remakes
+            n_probes (int, optional): Query the approximate backend directly
+                with this many probes, trading latency for recall
+            ranking (str): 'similarity' ranks on text similarity alone,
+                'hybrid' blends it with rating, popularity and genre overlap
+            weights (dict, optional): Hybrid weights overriding
+                hybrid_weights, see hybrid_scoring.HYBRID_WEIGHTS
+            filters (dict, optional): Only recommend movies passing these
+                filters, e.g. {'original_language': 'en',
+                'release_year': (2000, None), 'vote_count': (500, None)};
+                see catalog_filters.CatalogFilter
+        """
+        return self._cached_recommendations(
+            [('title', movie_title, year, n, n_probes, *self._ranking_key(ranking, weights),
+              CatalogFilter.normalize(filters))]
+        )[0]
+
+    @timed('get_recommendations_by_id')
+    def get_recommendations_by_id(self, movie_id, n=5, n_probes=None, ranking='similarity', weights=None,
+                                  filters=None):
+        """Get movie recommendations based on TMDB id, see get_recommendations"""
+        return self._cached_recommendations(
+            [('id', movie_id, None, n, n_probes, *self._ranking_key(ranking, weights),
+              CatalogFilter.normalize(filters))]
+        )[0]
+
+    @timed('get_recommendations_by_row')
+    def get_recommendations_by_row(self, row, n=5, n_probes=None, ranking='similarity', weights=None,
+                                   filters=None):
+        """
+        Get movie recommendations for a catalog row, see get_recommendations
+
+        Useful when the row is already resolved, e.g. from a TitleIndex
+        label, since titles and even ids can be shared by several rows.
+        """
+        if not 0 <= row < len(self.df):
+            raise IndexError(f"Row {row} is outside the catalog of {len(self.df)} movies")
+        return self._cached_recommendations(
+            [('row', int(row), None, n, n_probes, *self._ranking_key(ranking, weights),
+              CatalogFilter.normalize(filters))]
+        )[0]
+
+    @timed('get_recommendations_batch')
+    def get_recommendations_batch(self, movie_titles, n=5, n_probes=None, ranking='similarity',
+                                  weights=None, filters=None):
+        """
+        Get recommendations for several titles in one vectorized pass
+
+        Args:
+            movie_titles (list): Titles to get recommendations for
+            n (int): Number of recommendations per title
+            n_probes (int, optional): Probes for the approximate backend
+            ranking (str): 'similarity' or 'hybrid', see get_recommendations
+            weights (dict, optional): Hybrid weights
+            filters (dict, optional): Filters, see get_recommendations
+
+        Returns:
+            list: One list of movie records per title, or a not-found
+                message for titles missing from the catalog
+        """
+        options = (n, n_probes, *self._ranking_key(ranking, weights), CatalogFilter.normalize(filters))
+        return self._cached_recommendations([('title', title, None, *options) for title in movie_titles])
+
+    @timed('get_recommendations_many')
+    def get_recommendations_many(self, requests):
+        """
+        Answer a mix of title and id queries with different options at once
+
+        Queries sharing n and search options are scored together, so this
+        is what a server batching concurrent requests should call.
+
+        Args:
+            requests (list): Dicts with 'title' (and optionally 'year') or
+                'id', plus any of get_recommendations' keyword arguments
+                n, n_probes, ranking, weights and filters
+
+        Returns:
+            list: One result per request, as from get_recommendations
+        """
+        queries = []
+        for request in requests:
+            kind = 'title' if 'title' in request else 'id'
+            queries.append((
+                kind, request[kind], request.get('year'), request.get('n', 5), request.get('n_probes'),
+                *self._ranking_key(request.get('ranking', 'similarity'), request.get('weights')),
+                CatalogFilter.normalize(request.get('filters'))
+            ))
+        return self._cached_recommendations(queries)
+
+    def validate_ranking(self, ranking='similarity', weights=None):
+        """
+        Check ranking options before they are queued with other queries
+
+        Args:
+            ranking (str): 'similarity' or 'hybrid'
+            weights (dict, optional): Hybrid weights, see HYBRID_WEIGHTS
+
+        Raises:
+            ValueError: For an unknown ranking or weight name, or a weight
+                that is not a finite number
+        """
+        self._ranking_key(ranking, weights)
+
+    def _ranking_key(self, ranking, weights):
+        """Hashable (ranking, weights) pair identifying how results are ranked"""
+        if ranking == 'similarity':
+            return ranking, None
+        if ranking == 'hybrid':
+            if weights is not None and not isinstance(weights, dict):
+                raise ValueError(f"Hybrid weights must be a mapping of names to numbers, got {weights!r}")
+            unknown = set(weights or {}) - set(HYBRID_WEIGHTS)
+            if unknown:
+                raise ValueError(f"Unknown hybrid weights: {sorted(unknown)}")
+            weights = {name: float(weight) for name, weight in (weights or {}).items()}
+            invalid = sorted(name for name, weight in weights.items() if not math.isfinite(weight))
+            if invalid:
+                raise ValueError(f"Hybrid weights must be finite: {invalid}")
+            return ranking, tuple(sorted({**self.hybrid_weights, **weights}.items()))
+        raise ValueError(f"Unknown ranking: {ranking}")
+
+    def _cached_recommendations(self, queries):
+        """
+        Results for (kind, title, id or row, year, n, n_probes, ranking,
+        weights, filters) queries
+
+        Queries are answered from the result cache when it is enabled, and
+        the misses are computed together in one vectorized pass.
+        """
+        if self.result_cache is None:
+            return self._compute_recommendations(queries)
+
+        self.result_cache.set_version(self.data_version())
+        results = []
+        missing = []
+        for pos, query in enumerate(queries):
+            found, value = self.result_cache.get(query)
+            results.append(value)
+            if not found:
+                missing.append(pos)
+
+        computed = self._compute_recommendations([queries[pos] for pos in missing])
+        for pos, value in zip(missing, computed):
+            self.result_cache.put(queries[pos], value)
+            results[pos] = value
+
+        # Callers get their own records, so editing a result never alters the cache
+        return [list(map(dict, value)) if isinstance(value, list) else value for value in results]
+
+    def _compute_recommendations(self, queries):
+        results = [None] * len(queries)
+        groups = {}
+        for pos, query in enumerate(queries):
+            groups.setdefault(query[3:], []).append(pos)
+
+        for (n, n_probes, ranking, weights, filters), positions in groups.items():
+            lookups = [self._lookup(*queries[pos][:3]) for pos in positions]
+            group_results = self._recommend_rows(
+                lookups, [queries[pos][1] for pos in positions], n, n_probes,
+                ranking=ranking, weights=dict(weights) if weights else None, filters=filters
+            )
+            for pos, value in zip(positions, group_results):
+                results[pos] = value
+        return results
+
+    def _lookup(self, kind, value, year):
+        """Row of a 'title', 'id' or 'row' query, or None if not found"""
+        if kind == 'title':
+            return self.title_index.lookup(value, year)
+        if kind == 'id':
+            return self.title_index.lookup_id(value)
+        return value
+
+    def _recommend_rows(self, lookups, queries, n, n_probes=None, ranking='similarity', weights=None,
+                        filters=None):
+        """Recommendation records for resolved rows, aligned with queries"""
+        results = [self._not_found_message(query) if idx is None else None
+                   for query, idx in zip(queries, lookups)]
+        positions = [pos for pos, idx in enumerate(lookups) if idx is not None]
+        if not positions:
+            return results
+
+        rows = np.array([lookups[pos] for pos in positions])
+        movie_indices, _ = self.similar_rows(rows, n, n_probes, ranking=ranking, weights=weights,
+                                             filters=filters)
+        for pos, records in zip(positions, self._records(movie_indices)):
+            results[pos] = records
+        return results
+
+    def _records(self, movie_indices):
+        """Movie records for each row of an index array padded with -1"""
+        # Approximate and filtered search can return fewer than n neighbors
+        found = movie_indices >= 0
+        records = self.df.iloc[movie_indices[found]][
+            ['title', 'genre_names', 'vote_average', 'overview']
+        ].to_dict('records')
+
+        offsets = np.concatenate([[0], np.cumsum(found.sum(axis=1))])
+        return [records[offsets[i]:offsets[i + 1]] for i in range(len(movie_indices))]
+
+    @timed('get_profile_recommendations')
+    def get_profile_recommendations(self, history, n=10, method='centroid', filters=None):
+        """
+        Recommend movies for a watch history, excluding movies already seen
+
+        Args:
+            history (list or dict): Titles or TMDB ids, optionally as
+                (title or id, weight) pairs or a {title or id: weight} dict;
+                weights default to 1 and negative weights push away
+            n (int): Number of recommendations
+            method (str): 'centroid' scores the catalog against the
+                weighted mean of the history's TF-IDF vectors; 'neighbors'
+                sums weighted similarities over each movie's neighbor list
+            filters (dict, optional): Filters, see get_recommendations
+
+        Returns:
+            list: Movie records, or a message when no movie in the history
+                is in the catalog
+        """
+        return self.get_profile_recommendations_batch([history], n, method, filters)[0]
+
+    @timed('get_profile_recommendations_batch')
+    def get_profile_recommendations_batch(self, histories, n=10, method='centroid', filters=None):
+        """
+        Recommend movies for several watch histories in one pass
+
+        Args:
+            histories (list): Watch histories, see get_profile_recommendations
+            n (int): Number of recommendations per history
+            method (str): 'centroid' or 'neighbors'
+            filters (dict, optional): Filters, see get_recommendations
+
+        Returns:
+            list: One list of movie records per history
+        """
+        profiles = [self._resolve_history(history) for history in histories]
+        results = ["None of the movies in the history were found in database."
+                   if not len(rows) else None for rows, _ in profiles]
+        positions = [pos for pos, (rows, _) in enumerate(profiles) if len(rows)]
+        if positions:
+            movie_indices, _ = self.profile_rows([profiles[pos] for pos in positions], n, method, filters)
+            for pos, records in zip(positions, self._records(movie_indices)):
+                results[pos] = records
+        return results
+
+    def _resolve_history(self, history):
+        """(rows, weights) arrays of a watch history, skipping unknown movies"""
+        items = history.items() if isinstance(history, dict) else history
+        rows, weights = [], []
+        for item in items:
+            item, weight = item if isinstance(item, tuple) else (item, 1.0)
+            row = self.title_index.lookup(item) if isinstance(item, str) else self.title_index.lookup_id(item)
+            if row is not None:
+                rows.append(row)
+                weights.append(weight)
+        return np.array(rows, dtype=np.int64), np.array(weights, dtype=np.float64)
+
+    def profile_rows(self, profiles, n, method='centroid', filters=None):
+        """
+        Top-n movies for each profile, excluding the profile's own movies
+
+        Args:
+            profiles (list): (rows, weights) array pairs, one per profile
+            n (int): Number of results per profile
+            method (str): 'centroid' or 'neighbors', see
+                get_profile_recommendations
+            filters (dict or tuple, optional): Filters, see CatalogFilter
+
+        Returns:
+            tuple: (indices, scores) arrays of shape (len(profiles), n),
+                padded with index -1
+        """
+        if method not in ('centroid', 'neighbors'):
+            raise ValueError(f"Unknown profile method: {method}")
+        n_rows = self.tfidf_matrix.shape[0]
+        allowed = self.catalog_filter().mask(filters) if filters else None
+
+        # Profile x catalog weights; a movie listed twice has its weights summed
+        profile_ids = np.repeat(np.arange(len(profiles)), [len(rows) for rows, _ in profiles])
+        history_rows = np.concatenate([rows for rows, _ in profiles]).astype(np.int64)
+        history_weights = np.concatenate([weights for _, weights in profiles])
+        profile_weights = sparse.csr_matrix((history_weights, (profile_ids, history_rows)),
+                                            shape=(len(profiles), n_rows))
+        # Sorted profile * n_rows + row keys of every seen movie
+        seen = np.unique(profile_ids * n_rows + history_rows)
+
+        if method == 'centroid':
+            return self._centroid_rows(profile_weights, seen, n, allowed)
+        return self._neighbor_sum_rows(len(profiles), profile_ids, history_rows, history_weights, seen, n,
+                                       allowed)
+
+    def _centroid_rows(self, profile_weights, seen, n, allowed):
+        n_profiles, n_rows = profile_weights.shape
+        indices = np.full((n_profiles, n), -1, dtype=np.int64)
+        scores = np.full((n_profiles, n), -np.inf, dtype=np.float64)
+        block_size = self.model_params.get('block_size', 256)
+
+        for start in range(0, n_profiles, block_size):
+            stop = min(start + block_size, n_profiles)
+            centroids = normalize(profile_weights[start:stop] @ self.tfidf_matrix)
+
+            if self.backend.name != 'exact' and allowed is None:
+                # Over-fetch enough candidates to survive dropping seen movies
+                most_seen = int(np.diff(profile_weights[start:stop].indptr).max())
+                block_indices, block_scores = self.backend.query_vectors(centroids, n + most_seen)
+                keys = (np.arange(start, stop)[:, None] * n_rows + np.maximum(block_indices, 0))
+                block_scores = np.where(np.isin(keys, seen) | (block_indices < 0), -np.inf, block_scores)
+                top = top_k_indices(block_scores, n)
+                block_indices = np.take_along_axis(block_indices, top, axis=1)
+                block_scores = np.take_along_axis(block_scores, top, axis=1)
+            else:
+                block = (centroids @ self.tfidf_matrix.T).toarray()
+                in_block = (seen >= start * n_rows) & (seen < stop * n_rows)
+                block[seen[in_block] // n_rows - start, seen[in_block] % n_rows] = -np.inf
+                if allowed is not None:
+                    block[:, ~allowed] = -np.inf
+                block_indices = top_k_indices(block, n)
+                block_scores = np.take_along_axis(block, block_indices, axis=1)
+
+            indices[start:stop, :block_indices.shape[1]] = block_indices
+            scores[start:stop, :block_scores.shape[1]] = block_scores
+
+        indices[np.isneginf(scores)] = -1
+        return indices, scores
+
+    def _neighbor_sum_rows(self, n_profiles, profile_ids, history_rows, history_weights, seen, n, allowed):
+        n_rows = self.tfidf_matrix.shape[0]
+        pool = self.neighbor_index.k if self.neighbor_index is not None else max(n, self.model_params.get('k', 50))
+        neighbor_rows, neighbor_scores = self._similar_rows(history_rows, pool)
+
+        # One (profile, candidate, weighted similarity) triple per list entry
+        width = neighbor_rows.shape[1]
+        candidate_profiles = np.repeat(profile_ids, width)
+        candidates = neighbor_rows.ravel().astype(np.int64)
+        contributions = (history_weights[:, None] * neighbor_scores).ravel()
+        keep = (candidates >= 0) & ~np.isin(candidate_profiles * n_rows + candidates, seen)
+        if allowed is not None:
+            keep &= allowed[np.maximum(candidates, 0)]
+        totals = sparse.coo_matrix(
+            (contributions[keep], (candidate_profiles[keep], candidates[keep])), shape=(n_profiles, n_rows)
+        ).tocsr().tocoo()
+
+        # Best n per profile: sort by profile, score descending, then row
+        order = np.lexsort((totals.col, -totals.data, totals.row))
+        profile_of, row_of, score_of = totals.row[order], totals.col[order], totals.data[order]
+        rank = np.arange(len(order)) - np.searchsorted(profile_of, profile_of)
+        top = rank < n
+
+        indices = np.full((n_profiles, n), -1, dtype=np.int64)
+        scores = np.full((n_profiles, n), -np.inf, dtype=np.float64)
+        indices[profile_of[top], rank[top]] = row_of[top]
+        scores[profile_of[top], rank[top]] = score_of[top]
+        return indices, scores
+
+    def _not_found_message(self, query):
+        """Not-found message, with close title matches when there are any"""
+        message = f"Movie '{query}' not found in database."
+        if isinstance(query, str):
+            suggestions = self.title_index.suggest(query, limit=3)
+            if suggestions:
+                message += f" Did you mean: {', '.join(map(str, suggestions))}?"
+        return message
+
+    def similar_rows(self, rows, n, n_probes=None, ranking='similarity', weights=None, filters=None):
+        """
+        Top-n most similar movies for each query row, excluding itself
+
+        Args:
+            rows (array-like): Row positions of the query movies
+            n (int): Number of neighbors per row
+            n_probes (int, optional): Probes for the approximate backend
+            ranking (str): 'similarity' or 'hybrid'; hybrid reranks
+                hybrid_overfetch * n similarity candidates
+            weights (dict, optional): Hybrid weights overriding
+                hybrid_weights
+            filters (dict or tuple, optional): Only return movies passing
+                these filters, see catalog_filters.CatalogFilter
+
+        Returns:
+            tuple: (indices, scores) arrays with one row per query; rows
+                with fewer than n neighbors are padded with index -1
+        """
+        rows = np.asarray(rows)
+        allowed = self.catalog_filter().mask(filters) if filters else None
+        if ranking == 'hybrid':
+            pool = n * self.hybrid_overfetch
+            if self.neighbor_index is not None and n_probes is None:
+                # Stay within the precomputed lists rather than fall back to a full scan
+                pool = max(n, min(pool, self.neighbor_index.k))
+            candidates, similarities = self._similar_rows(rows, pool, n_probes, allowed)
+            return self.hybrid_scorer().rerank(rows, candidates, similarities, n,
+                                               {**self.hybrid_weights, **(weights or {})})
+        if ranking != 'similarity':
+            raise ValueError(f"Unknown ranking: {ranking}")
+        return self._similar_rows(rows, n, n_probes, allowed)
+
+    def _similar_rows(self, rows, n, n_probes=None, allowed=None):
+        if allowed is not None:
+            return self._filtered_similar_rows(rows, n, n_probes, allowed)
+
+        if self.neighbor_index is not None and n <= self.neighbor_index.k and n_probes is None:
+            return self.neighbor_index.neighbors(rows, n)
+
+        if self.similarity_matrix is not None:
+            scores = np.array(self.similarity_matrix[rows], dtype=np.float64)
+            scores[np.arange(len(rows)), rows] = -np.inf
+            indices = top_k_indices(scores, min(n, scores.shape[1] - 1))
+            return indices, np.take_along_axis(scores, indices, axis=1)
+
+        return self.backend.query_rows(rows, n, n_probes=n_probes)
+
+    def _filtered_similar_rows(self, rows, n, n_probes, allowed):
+        """
+        Top-n neighbors among the rows a filter mask allows
+
+        The mask is applied to the scores before selection, so every query
+        gets n results whenever n movies pass the filter. Stored neighbor
+        lists answer the queries that keep at least n of their entries;
+        the rest are scored exactly against only the allowed rows, which
+        gets cheaper the more selective the filter is.
+        """
+        indices = np.full((len(rows), n), -1, dtype=np.int64)
+        scores = np.full((len(rows), n), -np.inf, dtype=np.float64)
+        pending = np.arange(len(rows))
+
+        if self.similarity_matrix is not None:
+            block = np.array(self.similarity_matrix[rows], dtype=np.float64)
+            block[:, ~allowed] = -np.inf
+            block[np.arange(len(rows)), rows] = -np.inf
+            top = top_k_indices(block, n)
+            indices[:, :top.shape[1]] = top
+            scores[:, :top.shape[1]] = np.take_along_axis(block, top, axis=1)
+            pending = pending[:0]
+        elif self.neighbor_index is not None and n_probes is None:
+            stored, stored_scores = self.neighbor_index.neighbors(rows, self.neighbor_index.k)
+            passing = (stored >= 0) & allowed[np.maximum(stored, 0)]
+            complete = passing.sum(axis=1) >= n
+            # Stable sort moves passing entries to the front in score order
+            order = np.argsort(~passing[complete], axis=1, kind='stable')[:, :n]
+            indices[complete] = np.take_along_axis(stored[complete], order, axis=1)
+            scores[complete] = np.take_along_axis(stored_scores[complete], order, axis=1)
+            pending = pending[~complete]
+
+        if len(pending):
+            allowed_rows = np.flatnonzero(allowed)
+            # TF-IDF rows are L2-normalized, so the dot product is the cosine
+            block = (self.tfidf_matrix[rows[pending]] @ self.tfidf_matrix[allowed_rows].T).toarray()
+            positions = np.searchsorted(allowed_rows, rows[pending])
+            is_self = positions < len(allowed_rows)
+            is_self[is_self] = allowed_rows[positions[is_self]] == rows[pending][is_self]
+            block[np.flatnonzero(is_self), positions[is_self]] = -np.inf
+            top = top_k_indices(block, n)
+            indices[pending, :top.shape[1]] = allowed_rows[top]
+            scores[pending, :top.shape[1]] = np.take_along_axis(block, top, axis=1)
+
+        indices[np.isneginf(scores)] = -1
+        return indices, scores
+
+    def _catalog_derived(self, name, factory):
+        """Structure built from the catalog on first use and after it changes"""
+        stamp = (id(self.df), self.catalog_version)
+        if name not in self._derived or self._derived[name][0] != stamp:
+            self._derived[name] = (stamp, factory(self.df))
+        return self._derived[name][1]
+
+    def hybrid_scorer(self):
+        """HybridScorer for the current catalog"""
+        return self._catalog_derived('hybrid_scorer', HybridScorer)
+
+    def catalog_filter(self):
+        """CatalogFilter for the current catalog"""
+        return self._catalog_derived('catalog_filter', CatalogFilter)
+
+    @timed('get_popular_in_genre')
     def get_popular_in_genre(self, genre, n=5):
         """Get top rated movies in a specific genre"""
-        genre_movies = self.df[self.df['genre_names'].apply(lambda x: genre in x)]
-        return genre_movies.nlargest(n, 'vote_average')[
+        return self.df.iloc[self.inverted_index.top_rated(genre, n)][
             ['title', 'vote_average', 'genre_names']
-        ].to_dict('records')
\ No newline at end of file
+        ].to_dict('records')
+
+    @timed('get_movies_by_person')
+    def get_movies_by_person(self, name, n=5):
+        """Get top rated movies directed by or starring a person"""
+        rows = np.union1d(self.inverted_index.rows_for_director(name),
+                          self.inverted_index.rows_for_actor(name))
+        ratings = self.df['vote_average'].to_numpy(dtype=np.float64)[rows]
+        rows = rows[np.argsort(-np.nan_to_num(ratings, nan=-np.inf), kind='stable')[:n]]
+        return self.df.iloc[rows][
+            ['title', 'vote_average', 'director', 'main_cast']
+        ].to_dict('records')
+
+    def save(self, artifact_dir, fingerprint=None):
+        """
+        Write the fitted model to a versioned artifact directory
+
+        The vocabulary, IDF weights, sparse TF-IDF matrix, neighbor arrays
+        and catalog are written to a staging directory that replaces
+        artifact_dir in one step, so readers never see a partial artifact.
+
+        Args:
+            artifact_dir (str): Destination directory
+            fingerprint (str, optional): Hash of the source CSV
+        """
+        parent = os.path.dirname(os.path.abspath(artifact_dir))
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.model-', dir=parent)
+
+        try:
+            if self._is_hashing():
+                self.vectorizer.save(staging)
+            else:
+                with open(os.path.join(staging, 'vocabulary.json'), 'w') as f:
+                    json.dump({term: int(col) for term, col in self.vectorizer.vocabulary_.items()}, f)
+            np.save(os.path.join(staging, 'idf.npy'), self.vectorizer.idf_)
+
+            np.save(os.path.join(staging, 'tfidf_data.npy'), self.tfidf_matrix.data)
+            np.save(os.path.join(staging, 'tfidf_indices.npy'), self.tfidf_matrix.indices)
+            np.save(os.path.join(staging, 'tfidf_indptr.npy'), self.tfidf_matrix.indptr)
+
+            if self.neighbor_index is not None:
+                np.save(os.path.join(staging, 'neighbor_indices.npy'), self.neighbor_index.indices)
+                np.save(os.path.join(staging, 'neighbor_scores.npy'), self.neighbor_index.scores)
+            if self.similarity_matrix is not None:
+                np.save(os.path.join(staging, 'similarity_matrix.npy'), self.similarity_matrix)
+            self.backend.save(os.path.join(staging, 'backend'))
+
+            catalog = self.df.drop(columns=[c for c in CATALOG_BLOB_COLUMNS if c in self.df.columns])
+            catalog.to_pickle(os.path.join(staging, 'catalog.pkl'))
+            with open(os.path.join(staging, 'title_index.pkl'), 'wb') as f:
+                pickle.dump(self.title_index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            with open(os.path.join(staging, 'inverted_index.pkl'), 'wb') as f:
+                pickle.dump(self.inverted_index, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            manifest = {
+                'version': ARTIFACT_VERSION,
+                'fingerprint': fingerprint,
+                'n_movies': int(self.tfidf_matrix.shape[0]),
+                'n_terms': int(self.tfidf_matrix.shape[1]),
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'model_id': self.model_id,
+                'catalog_version': self.catalog_version,
+                'update_stats': self.update_stats,
+                **self.model_params
+            }
+            with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+                json.dump(manifest, f, indent=2)
+
+            _replace_directory(staging, artifact_dir)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    @staticmethod
+    def read_manifest(artifact_dir):
+        """Artifact manifest as a dict, or None if there is no artifact"""
+        try:
+            with open(os.path.join(artifact_dir, 'manifest.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def manifest_data_version(manifest):
+        """data_version() of a saved model, read from its manifest without loading it"""
+        return f"{manifest.get('model_id') or manifest['created_at']}.{manifest.get('catalog_version', 0)}"
+
+    @classmethod
+    def load(cls, artifact_dir, mmap=True):
+        """
+        Load a saved model artifact
+
+        Args:
+            artifact_dir (str): Directory written by save()
+            mmap (bool): Memory-map the arrays instead of reading them,
+                so processes loading the same artifact share pages
+
+        Returns:
+            MovieRecommender: Recommender ready to answer queries
+        """
+        manifest = cls.read_manifest(artifact_dir)
+        if manifest is None or manifest.get('version') != ARTIFACT_VERSION:
+            raise ValueError(f"No compatible model artifact in {artifact_dir}")
+
+        mmap_mode = 'r' if mmap else None
+        def load_array(name):
+            return np.load(os.path.join(artifact_dir, f'{name}.npy'), mmap_mode=mmap_mode)
+
+        df = pd.read_pickle(os.path.join(artifact_dir, 'catalog.pkl'))
+        with open(os.path.join(artifact_dir, 'title_index.pkl'), 'rb') as f:
+            title_index = pickle.load(f)
+        with open(os.path.join(artifact_dir, 'inverted_index.pkl'), 'rb') as f:
+            inverted_index = pickle.load(f)
+        recommender = cls(df, title_index=title_index, inverted_index=inverted_index)
+
+        if manifest['vectorizer'] == 'hashing':
+            recommender.vectorizer = HashingTfidfVectorizer.load(artifact_dir)
+        else:
+            with open(os.path.join(artifact_dir, 'vocabulary.json')) as f:
+                vocabulary = json.load(f)
+            recommender.vectorizer = TfidfVectorizer(stop_words='english')
+            recommender.vectorizer.vocabulary_ = vocabulary
+            recommender.vectorizer.idf_ = np.asarray(load_array('idf'))
+
+        recommender.tfidf_matrix = sparse.csr_matrix(
+            (load_array('tfidf_data'), load_array('tfidf_indices'), load_array('tfidf_indptr')),
+            shape=(manifest['n_movies'], manifest['n_terms']),
+            copy=False
+        )
+
+        recommender.backend = BACKENDS[manifest['backend']].load(
+            os.path.join(artifact_dir, 'backend'), recommender.tfidf_matrix, mmap=mmap
+        )
+        if manifest['mode'] == 'neighbors':
+            recommender.neighbor_index = NeighborIndex(k=manifest['k'], block_size=manifest['block_size'])
+            recommender.neighbor_index.indices = load_array('neighbor_indices')
+            recommender.neighbor_index.scores = load_array('neighbor_scores')
+        elif manifest['mode'] == 'dense':
+            recommender.similarity_matrix = load_array('similarity_matrix')
+
+        recommender.model_params = {key: manifest[key] for key in ('mode', 'k', 'block_size', 'backend',
+                                                                   'vectorizer')}
+        recommender.model_params['compact'] = manifest.get('compact', False)
+        recommender.model_id = manifest.get('model_id') or manifest['created_at']
+        recommender.catalog_version = manifest.get('catalog_version', 0)
+        recommender.update_stats = {**UPDATE_STATS, **manifest.get('update_stats', {})}
+        return recommender
+
+    @classmethod
+    def load_or_build(cls, file_path, artifact_dir, df=None, mode='neighbors', k=50, block_size=256,
+                      compact=False, backend='exact'):
+        """
+        Load the saved model, rebuilding it first if it is missing or stale
+
+        An artifact is stale when the CSV fingerprint, the artifact format
+        version or the model parameters no longer match.
+
+        Args:
+            file_path (str): Path to the movies CSV file
+            artifact_dir (str): Model artifact directory
+            df (pd.DataFrame, optional): Already feature-engineered data to
+                build from instead of reprocessing the CSV
+            mode (str): Model mode, see build_content_based_model
+            k (int): Neighbors kept per movie in 'neighbors' mode
+            block_size (int): Rows scored at once in 'neighbors' mode
+            compact (bool): Store a memory-compacted catalog, see
+                FeatureEngineer.compact_features; off by default. main.py
+                and the dashboard share one artifact through the defaults,
+                and a different value here rebuilds it
+            backend (str): Similarity backend name, see build_content_based_model
+
+        Returns:
+            MovieRecommender: Recommender ready to answer queries
+        """
+        fingerprint = file_fingerprint(file_path)
+        manifest = cls.read_manifest(artifact_dir)
+        expected = {'version': ARTIFACT_VERSION, 'fingerprint': fingerprint, 'mode': mode, 'k': k,
+                    'compact': compact, 'backend': backend, 'vectorizer': 'tfidf'}
+        if manifest is not None and all(manifest.get(key) == value for key, value in expected.items()):
+            return cls.load(artifact_dir)
+
+        if df is None:
+            df = load_processed_data(file_path, compact=compact)
+        elif compact:
+            df = FeatureEngineer(df).compact_features()
+        recommender = cls(df)
+        recommender.build_content_based_model(mode=mode, k=k, block_size=block_size, backend=backend)
+        recommender.model_params['compact'] = compact
+        recommender.save(artifact_dir, fingerprint=fingerprint)
+        return recommender
+
+
+def _replace_directory(source, destination):
+    """Move source into place at destination, replacing any old copy"""
+    backup = None
+    if os.path.exists(destination):
+        backup = tempfile.mkdtemp(prefix='.model-old-', dir=os.path.dirname(os.path.abspath(destination)))
+        os.rmdir(backup)
+        os.rename(destination, backup)
+    os.rename(source, destination)
+    if backup is not None:
+        shutil.rmtree(backup, ignore_errors=True)
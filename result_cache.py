@@ -0,0 +1,155 @@
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    Two-level cache for query results
+
+    The first level is a bounded in-process LRU. The optional second level
+    is a directory of pickled entries shared by every process pointing at
+    it. Entries belong to a version string, e.g. the model and catalog
+    version; changing it drops the in-process entries and makes the disk
+    entries of older versions unreachable.
+    """
+
+    def __init__(self, max_entries=1024, ttl=None, disk_dir=None):
+        """
+        Args:
+            max_entries (int): In-process entries kept before the least
+                recently used one is evicted
+            ttl (float, optional): Seconds an entry stays valid in either
+                level; entries never expire if omitted
+            disk_dir (str, optional): Directory of the shared on-disk level
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.version = None
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0,
+                      'expirations': 0, 'invalidations': 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set_version(self, version):
+        """
+        Switch to a new version, invalidating entries of every other one
+
+        Args:
+            version (str): Identifier of the data the results came from
+        """
+        with self._lock:
+            if version == self.version:
+                return
+            if self.version is not None:
+                self.stats['invalidations'] += 1
+                self._entries.clear()
+            self.version = version
+
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            # Other processes may still serve an older version, so only
+            # directories untouched for a day are cleaned up
+            cutoff = time.time() - 86400
+            for name in os.listdir(self.disk_dir):
+                path = os.path.join(self.disk_dir, name)
+                if name != version and os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+
+    def get(self, key):
+        """
+        Look up a result
+
+        Args:
+            key (tuple): Hashable, picklable key
+
+        Returns:
+            tuple: (found, value); value is None when not found
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self._expired(stored_at, now):
+                    del self._entries[key]
+                    self.stats['expirations'] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return True, value
+
+        if self.disk_dir:
+            entry = self._read_disk(key)
+            if entry is not None and not self._expired(entry[0], now):
+                with self._lock:
+                    self.stats['disk_hits'] += 1
+                    self._store(key, entry)
+                return True, entry[1]
+
+        with self._lock:
+            self.stats['misses'] += 1
+        return False, None
+
+    def put(self, key, value):
+        """
+        Store a result in both levels
+
+        Args:
+            key (tuple): Hashable, picklable key
+            value: Picklable result
+        """
+        entry = (time.time(), value)
+        with self._lock:
+            self._store(key, entry)
+        if self.disk_dir:
+            self._write_disk(key, entry)
+
+    def clear(self):
+        """Drop every in-process entry; the disk level is left alone"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expired(self, stored_at, now):
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _disk_path(self, key):
+        digest = hashlib.sha256(pickle.dumps(key, protocol=4)).hexdigest()
+        return os.path.join(self.disk_dir, str(self.version), digest[:2], f'{digest}.pkl')
+
+    def _read_disk(self, key):
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                stored_key, stored_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        # Guards against the vanishingly rare digest collision
+        return (stored_at, value) if stored_key == key else None
+
+    def _write_disk(self, key, entry):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((key, *entry), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The disk level is best effort; a failed write is just a miss later
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,68 @@
+import numpy as np
+
+
+class RowKeys:
+    """
+    Stable keys for catalog rows, surviving renumbering
+
+    Removing a movie shifts every later row down. Indexes store each
+    movie's key instead, assigned once in catalog order, and translate
+    keys to current rows when answering, so removing or appending movies
+    never rewrites their entries. Translation is an array gather.
+    """
+
+    def __init__(self, n_rows=0):
+        """
+        Args:
+            n_rows (int): Rows of the initial catalog, keyed 0..n_rows-1
+        """
+        # Key -> current row, -1 once removed; row -> key
+        self.row_of = np.arange(n_rows, dtype=np.int64)
+        self.key_of = np.arange(n_rows, dtype=np.int64)
+
+    def __len__(self):
+        """Number of live rows"""
+        return len(self.key_of)
+
+    @property
+    def n_removed(self):
+        """Keys whose rows were removed"""
+        return len(self.row_of) - len(self.key_of)
+
+    def append(self, n_rows):
+        """
+        Key rows appended at the end of the catalog
+
+        Returns:
+            np.ndarray: Keys of the new rows, in row order
+        """
+        keys = np.arange(len(self.row_of), len(self.row_of) + n_rows, dtype=np.int64)
+        self.row_of = np.concatenate([self.row_of, np.arange(len(self.key_of), len(self.key_of) + n_rows)])
+        self.key_of = np.concatenate([self.key_of, keys])
+        return keys
+
+    def remove(self, keep):
+        """
+        Drop rows and renumber the rest
+
+        Args:
+            keep (np.ndarray): Boolean mask over current rows
+
+        Returns:
+            np.ndarray: Keys of the removed rows
+        """
+        removed = self.key_of[~keep]
+        self.row_of[removed] = -1
+        self.key_of = self.key_of[keep]
+        self.row_of[self.key_of] = np.arange(len(self.key_of))
+        return removed
+
+    def rows(self, keys):
+        """Current rows of some keys, skipping removed ones; sorted keys give sorted rows"""
+        rows = self.row_of[keys]
+        return rows[rows >= 0]
+
+    def row(self, key):
+        """Current row of one key, or None if it was removed"""
+        row = int(self.row_of[key])
+        return row if row >= 0 else None
@@ -0,0 +1,260 @@
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+from data_loader import MovieDataLoader, _require_pyarrow
+from feature_engineering import FeatureEngineer
+
+logger = logging.getLogger(__name__)
+
+# Hash buckets; collisions are rare well below a million distinct terms
+DEFAULT_N_FEATURES = 2 ** 20
+
+
+class HashingTfidfVectorizer:
+    """
+    TF-IDF with hashed term columns instead of a vocabulary dictionary
+
+    Tokenization, stop words and the smoothed IDF formula match
+    TfidfVectorizer(stop_words='english'); terms are mapped to one of
+    n_features columns by hashing, so memory does not grow with the
+    vocabulary and document frequencies can be accumulated chunk by chunk.
+    """
+
+    def __init__(self, n_features=DEFAULT_N_FEATURES):
+        """
+        Args:
+            n_features (int): Number of hash buckets (matrix columns)
+        """
+        self.n_features = n_features
+        self.hasher = HashingVectorizer(n_features=n_features, stop_words='english',
+                                        alternate_sign=False, norm=None)
+        self.n_documents_ = 0
+        self.document_frequency_ = np.zeros(n_features, dtype=np.int64)
+        self.idf_ = None
+
+    def count(self, texts):
+        """Raw term counts of some documents, one row each"""
+        return self.hasher.transform(pd.Series(texts).fillna('')).tocsr()
+
+    def partial_fit(self, counts):
+        """
+        Add a chunk of documents to the document frequencies
+
+        Args:
+            counts (scipy.sparse.csr_matrix): Output of count()
+
+        Returns:
+            HashingTfidfVectorizer: self
+        """
+        self.n_documents_ += counts.shape[0]
+        self.document_frequency_ += np.bincount(counts.indices, minlength=self.n_features)
+        return self
+
+    def finalize(self):
+        """Compute IDF weights from the accumulated document frequencies"""
+        self.idf_ = np.log((1 + self.n_documents_) / (1 + self.document_frequency_)) + 1
+        return self
+
+    def weight(self, counts):
+        """Apply IDF weights to raw counts and L2-normalize each row"""
+        weighted = counts.astype(np.float64)
+        weighted.data *= self.idf_[weighted.indices]
+        return normalize(weighted)
+
+    def transform(self, texts):
+        """
+        TF-IDF vectors for new documents with the fitted weights
+
+        Args:
+            texts (iterable): Documents
+
+        Returns:
+            scipy.sparse.csr_matrix: L2-normalized rows
+        """
+        return self.weight(self.count(texts))
+
+    def build_analyzer(self):
+        """Tokenizer used before hashing, as on TfidfVectorizer"""
+        return self.hasher.build_analyzer()
+
+    def unseen_terms(self, tokens):
+        """How many tokens hash to a bucket no fitted document used"""
+        if not tokens:
+            return 0
+        counts = self.hasher.transform([' '.join(tokens)])
+        return int(counts.data[self.document_frequency_[counts.indices] == 0].sum())
+
+    def save(self, directory):
+        """Write the parameters and document frequencies to a directory"""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'document_frequency.npy'), self.document_frequency_)
+        with open(os.path.join(directory, 'hashing.json'), 'w') as f:
+            json.dump({'n_features': self.n_features, 'n_documents': self.n_documents_}, f)
+
+    @classmethod
+    def load(cls, directory):
+        """Rebuild a fitted vectorizer written by save()"""
+        with open(os.path.join(directory, 'hashing.json')) as f:
+            params = json.load(f)
+        vectorizer = cls(n_features=params['n_features'])
+        vectorizer.n_documents_ = params['n_documents']
+        vectorizer.document_frequency_ = np.load(os.path.join(directory, 'document_frequency.npy'))
+        return vectorizer.finalize()
+
+
+def stream_tfidf_matrix(text_chunks, output_dir, n_features=DEFAULT_N_FEATURES):
+    """
+    Vectorize a corpus chunk by chunk into an on-disk TF-IDF matrix
+
+    The first pass hashes each chunk, adds it to the document frequencies
+    and spills its raw counts to a shard file. Once IDF is known, the
+    second pass weights and normalizes one shard at a time and writes it
+    into memory-mapped CSR arrays. Peak memory is one chunk plus the
+    n_features document frequencies, whatever the corpus or vocabulary
+    size. The arrays use the same file names as a MovieRecommender
+    artifact.
+
+    Args:
+        text_chunks (iterable): Chunks of documents, e.g. from
+            iter_csv_features or iter_cache_features
+        output_dir (str): Directory for the matrix files
+        n_features (int): Hash buckets
+
+    Returns:
+        tuple: (HashingTfidfVectorizer, scipy.sparse.csr_matrix) with the
+            matrix memory-mapped from output_dir
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    shard_dir = os.path.join(output_dir, 'shards')
+    os.makedirs(shard_dir, exist_ok=True)
+    vectorizer = HashingTfidfVectorizer(n_features=n_features)
+
+    shards = []
+    for texts in text_chunks:
+        counts = vectorizer.count(texts)
+        vectorizer.partial_fit(counts)
+        path = os.path.join(shard_dir, f'shard-{len(shards):05d}.npz')
+        sparse.save_npz(path, counts, compressed=False)
+        shards.append((path, counts.shape[0], counts.nnz))
+        logger.info(f"Hashed shard {len(shards)}: {vectorizer.n_documents_} documents so far")
+    vectorizer.finalize()
+
+    n_rows = sum(rows for _, rows, _ in shards)
+    nnz = sum(entries for _, _, entries in shards)
+    data = np.lib.format.open_memmap(os.path.join(output_dir, 'tfidf_data.npy'), mode='w+',
+                                     dtype=np.float64, shape=(nnz,))
+    indices = np.lib.format.open_memmap(os.path.join(output_dir, 'tfidf_indices.npy'), mode='w+',
+                                        dtype=np.int32, shape=(nnz,))
+    indptr = np.lib.format.open_memmap(os.path.join(output_dir, 'tfidf_indptr.npy'), mode='w+',
+                                       dtype=np.int64, shape=(n_rows + 1,))
+    indptr[0] = 0
+
+    row, offset = 0, 0
+    for path, rows, entries in shards:
+        shard = vectorizer.weight(sparse.load_npz(path))
+        shard.sort_indices()
+        data[offset:offset + entries] = shard.data
+        indices[offset:offset + entries] = shard.indices
+        indptr[row + 1:row + rows + 1] = shard.indptr[1:] + offset
+        row += rows
+        offset += entries
+        os.remove(path)
+    for array in (data, indices, indptr):
+        array.flush()
+    del data, indices, indptr
+    shutil.rmtree(shard_dir, ignore_errors=True)
+    vectorizer.save(output_dir)
+
+    return vectorizer, load_tfidf_matrix(output_dir, n_rows, n_features)
+
+
+def load_tfidf_matrix(directory, n_rows, n_columns, mmap=True):
+    """Memory-map a CSR matrix stored as tfidf_data/indices/indptr.npy"""
+    mmap_mode = 'r' if mmap else None
+    def load_array(name):
+        return np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+    return sparse.csr_matrix(
+        (load_array('tfidf_data'), load_array('tfidf_indices'), load_array('tfidf_indptr')),
+        shape=(n_rows, n_columns), copy=False
+    )
+
+
+def iter_csv_features(file_path, chunksize=50000):
+    """
+    Clean the raw CSV chunk by chunk and yield its combined features
+
+    Args:
+        file_path (str): Path to the movies CSV file
+        chunksize (int): Rows per chunk
+
+    Yields:
+        pd.Series: 'combined_features' of one chunk
+    """
+    loader = MovieDataLoader(file_path, log_level=logging.WARNING, derived_only=True)
+    for chunk in pd.read_csv(file_path, chunksize=chunksize):
+        cleaned = loader._clean_data(chunk)
+        yield FeatureEngineer(cleaned).create_combined_features()['combined_features']
+
+
+def iter_cache_features(cache_path, batch_size=50000):
+    """
+    Yield the 'combined_features' column of a Parquet cache in batches
+
+    Args:
+        cache_path (str): Parquet file with a 'combined_features' column,
+            e.g. the processed catalog written by main.py
+        batch_size (int): Rows per batch
+
+    Yields:
+        pd.Series: One batch of documents
+    """
+    _, pq = _require_pyarrow()
+    for batch in pq.ParquetFile(cache_path).iter_batches(batch_size=batch_size,
+                                                         columns=['combined_features']):
+        yield batch.column(0).to_pandas()
+
+
+def compare_to_tfidf(texts, n_features=DEFAULT_N_FEATURES, k=10, sample_size=1000, seed=0):
+    """
+    Measure how closely hashed TF-IDF neighbors match exact TF-IDF ones
+
+    Both models are fitted on the same documents; recall@k is the share
+    of each sampled movie's exact TF-IDF top-k that the hashed model
+    also returns.
+
+    Args:
+        texts (pd.Series): Documents, e.g. a sample of 'combined_features'
+        n_features (int): Hash buckets of the model under test
+        k (int): Neighbors compared per movie
+        sample_size (int): Movies queried
+        seed (int): Sampling seed
+
+    Returns:
+        dict: recall_at_k and both models' column counts
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from similarity_backends import ExactCosineBackend, evaluate_backend
+
+    texts = pd.Series(texts).fillna('').reset_index(drop=True)
+    reference = TfidfVectorizer(stop_words='english').fit_transform(texts)
+    hashing = HashingTfidfVectorizer(n_features=n_features)
+    counts = hashing.count(texts)
+    hashed = hashing.partial_fit(counts).finalize().weight(counts)
+
+    rows = np.random.default_rng(seed).choice(len(texts), min(sample_size, len(texts)), replace=False)
+    result = evaluate_backend(ExactCosineBackend().build(hashed), ExactCosineBackend().build(reference),
+                              rows, k=k)
+    return {
+        'recall_at_k': result['recall_at_k'],
+        'k': k,
+        'tfidf_terms': reference.shape[1],
+        'hash_buckets': n_features
+    }
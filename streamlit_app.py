@@ -1,32 +1,64 @@
+import os
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from data_loader import MovieDataLoader
-from eda import MovieEDA
+from eda import EDAAggregates, MovieEDA, downsample_bars, downsample_line
+from pipeline import file_fingerprint
 from recommender import MovieRecommender
-from feature_engineering import FeatureEngineer
 
-def load_data():
-    data_loader = MovieDataLoader("C:/Users/512GB/OneDrive/Documents/Company tasks/data/movies.csv")
-    df = data_loader.load_data()
-    
-    engineer = FeatureEngineer(df)
-    df = engineer.create_combined_features()
-    df = engineer.encode_categorical_features()
-    df = engineer.normalize_numeric_features()
-    
-    return df
+DATA_PATH = "C:/Users/512GB/OneDrive/Documents/Company tasks/data/movies.csv"
+ARTIFACT_DIR = "Outputs/model"
+RESULT_CACHE_DIR = "Outputs/cache/recommendations"
+EDA_AGGREGATES_PATH = os.path.join(ARTIFACT_DIR, "eda_aggregates.pkl")
+# Fields read by show_overview
+OVERVIEW_FIELDS = ['title', 'budget', 'revenue', 'vote_average', 'runtime', 'release_date', 'release_year']
+
+@st.cache_resource
+def load_recommender():
+    # Loads the saved model artifact, refitting only when the CSV changed.
+    # Same parameters as main.py, so both reuse one artifact
+    recommender = MovieRecommender.load_or_build(DATA_PATH, ARTIFACT_DIR)
+    # Replicas share results for popular titles through the disk cache
+    recommender.enable_result_cache(max_entries=2048, disk_dir=RESULT_CACHE_DIR)
+    return recommender
+
+@st.cache_resource
+def load_aggregates(version, _df):
+    # Keyed by the catalog version, so page switches and reruns reuse one
+    # store; it is rebuilt and saved again only when the catalog changes
+    aggregates = EDAAggregates.load(EDA_AGGREGATES_PATH, version)
+    if aggregates is None:
+        aggregates = EDAAggregates(_df, version=version)
+        aggregates.save(EDA_AGGREGATES_PATH)
+    return aggregates
+
+def overview_version():
+    # Cheap to read on every rerun: the CSV's size and modification time and
+    # the saved model's data version. The CSV is only hashed when they change.
+    stat = os.stat(DATA_PATH)
+    manifest = MovieRecommender.read_manifest(ARTIFACT_DIR)
+    data_version = MovieRecommender.manifest_data_version(manifest) if manifest is not None else None
+    return stat.st_size, stat.st_mtime_ns, data_version
+
+@st.cache_resource
+def load_overview_eda(version):
+    # Keyed by overview_version(), so a changed CSV or model is picked up
+    # without a restart. The overview needs neither the model nor the
+    # nested JSON columns. Use the aggregate store when it matches the
+    # current CSV, otherwise read and clean just the overview's fields.
+    manifest = MovieRecommender.read_manifest(ARTIFACT_DIR)
+    if manifest is not None and manifest.get('fingerprint') == file_fingerprint(DATA_PATH):
+        aggregates = EDAAggregates.load(EDA_AGGREGATES_PATH, MovieRecommender.manifest_data_version(manifest))
+        if aggregates is not None:
+            return MovieEDA(None, aggregates=aggregates)
+    catalog = MovieDataLoader(DATA_PATH).load_fields(OVERVIEW_FIELDS)
+    return MovieEDA(catalog.to_frame())
 
 def main():
     st.title("Movie Analysis Dashboard")
     
-    # Load data
-    df = load_data()
-    eda = MovieEDA(df)
-    recommender = MovieRecommender(df)
-    recommender.build_content_based_model()
-    
     # Sidebar navigation
     page = st.sidebar.selectbox(
         "Choose a page", 
@@ -34,15 +66,22 @@ def main():
     )
     
     if page == "Overview":
-        show_overview(df, eda)
-    elif page == "Movie Explorer":
-        show_movie_explorer(df)
+        show_overview(load_overview_eda(overview_version()))
+        return
+    
+    # Load data
+    recommender = load_recommender()
+    df = recommender.df
+    eda = MovieEDA(df, aggregates=load_aggregates(recommender.data_version(), df))
+    
+    if page == "Movie Explorer":
+        show_movie_explorer(df, recommender.title_index)
     elif page == "Recommendations":
-        show_recommendations(df, recommender)
+        show_recommendations(df, recommender, eda)
     else:
-        show_genre_analysis(df, eda)
+        show_genre_analysis(eda)
 
-def show_overview(df, eda):
+def show_overview(eda):
     st.header("Dataset Overview")
     
     # Basic stats
@@ -58,7 +97,7 @@ def show_overview(df, eda):
     
     # Timeline
     st.subheader("Movies Over Time")
-    yearly_movies = df.groupby('release_year').size()
+    yearly_movies = downsample_line(eda.analyze_years())
     fig = px.line(x=yearly_movies.index, y=yearly_movies.values)
     fig.update_layout(title="Number of Movies by Year",
                      xaxis_title="Year",
@@ -70,14 +109,14 @@ def show_overview(df, eda):
     top_movies = eda.get_top_movies('revenue', n=10)
     st.dataframe(pd.DataFrame(top_movies))
 
-def show_movie_explorer(df):
+def show_movie_explorer(df, title_index):
     st.header("Movie Explorer")
     
     # Movie search
-    movie_title = st.selectbox("Select a movie", df['title'].sort_values())
+    movie_label = st.selectbox("Select a movie", title_index.labels())
     
-    if movie_title:
-        movie = df[df['title'] == movie_title].iloc[0]
+    if movie_label:
+        movie = df.iloc[title_index.lookup_label(movie_label)]
         
         col1, col2 = st.columns(2)
         
@@ -98,15 +137,22 @@ def show_movie_explorer(df):
         st.subheader("Overview")
         st.write(movie['overview'])
 
-def show_recommendations(df, recommender):
+def show_recommendations(df, recommender, eda):
     st.header("Movie Recommendations")
     
     # Movie selection
-    movie_title = st.selectbox("Select a movie for recommendations", 
-                              df['title'].sort_values())
-    
-    if movie_title:
-        recommendations = recommender.get_recommendations(movie_title)
+    title_index = recommender.title_index
+    movie_label = st.selectbox("Select a movie for recommendations", 
+                              title_index.labels())
+    
+    if movie_label:
+        idx = title_index.lookup_label(movie_label)
+        # Recommend from the labelled row itself; its title and year may be shared
+        recommendations = recommender.get_recommendations_by_row(
+            idx, filters=recommendation_filters(eda))
+        
+        if not recommendations:
+            st.info("No similar movies match these filters.")
         
         st.subheader("Similar Movies")
         for movie in recommendations:
@@ -114,31 +160,40 @@ def show_recommendations(df, recommender):
                 st.write(f"**Genres:** {', '.join(movie['genre_names'])}")
                 st.write(movie['overview'])
 
-def show_genre_analysis(df, eda):
+def recommendation_filters(eda):
+    """Filter widgets for the recommendations page"""
+    with st.expander("Filters"):
+        languages = st.multiselect("Original language",
+                                   sorted(eda.analyze_languages().index))
+        years = eda.aggregates.year_range
+        year_range = None
+        if years and years[0] < years[1]:
+            year_range = st.slider("Release year", years[0], years[1], years)
+        min_votes = st.number_input("Minimum votes", min_value=0, value=0, step=100)
+    
+    filters = {}
+    if languages:
+        filters['original_language'] = languages
+    if year_range and year_range != years:
+        filters['release_year'] = year_range
+    if min_votes:
+        filters['vote_count'] = (min_votes, None)
+    return filters
+
+def show_genre_analysis(eda):
     st.header("Genre Analysis")
     
     # Genre distribution
-    genre_counts = eda.analyze_genres()
+    genre_counts = downsample_bars(eda.analyze_genres())
     fig = px.bar(x=genre_counts.index, y=genre_counts.values)
     fig.update_layout(title="Movies by Genre",
                      xaxis_title="Genre",
                      yaxis_title="Number of Movies")
     st.plotly_chart(fig)
     
-    # Genre performance
+    # Genre performance, precomputed in the aggregate store
     st.subheader("Genre Performance")
-    genre_metrics = []
-    
-    for genre in genre_counts.index:
-        genre_movies = df[df['genre_names'].apply(lambda x: genre in x)]
-        genre_metrics.append({
-            'genre': genre,
-            'avg_revenue': genre_movies['revenue'].mean(),
-            'avg_rating': genre_movies['vote_average'].mean(),
-            'avg_roi': genre_movies['roi'].mean()
-        })
-    
-    metrics_df = pd.DataFrame(genre_metrics)
+    metrics_df = eda.genre_performance()
     
     metric = st.selectbox("Select metric", 
                          ['avg_revenue', 'avg_rating', 'avg_roi'])
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# Modules live at the repository root, like the scripts import them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import generate_catalog
+from pipeline import load_processed_data
+
+
+@pytest.fixture(scope='session')
+def catalog_path(tmp_path_factory):
+    """Synthetic TMDB-shaped movies CSV"""
+    return generate_catalog(600, str(tmp_path_factory.mktemp('data') / 'movies.csv'), seed=1)
+
+
+@pytest.fixture(scope='session')
+def processed(catalog_path):
+    """Feature-engineered catalog, full dtypes"""
+    return load_processed_data(catalog_path)
@@ -0,0 +1,21 @@
+import pytest
+
+from batch_recommend import run_batch
+from recommender import MovieRecommender
+
+
+def test_resume_refuses_shards_from_an_updated_artifact(processed, tmp_path):
+    model_dir, output_dir = str(tmp_path / 'model'), str(tmp_path / 'out')
+    # Same movies before and after the update, so only the model differs
+    movie_ids = processed['id'].iloc[:400].tolist()
+    recommender = MovieRecommender(processed.iloc[:550].reset_index(drop=True))
+    recommender.build_content_based_model(mode='neighbors', k=10)
+    recommender.save(model_dir)
+    assert run_batch(model_dir, output_dir, n=5, movie_ids=movie_ids, shard_size=200)['shards_written'] == 2
+    assert run_batch(model_dir, output_dir, n=5, movie_ids=movie_ids, shard_size=200)['shards_written'] == 0
+
+    updated = MovieRecommender.load(model_dir)
+    updated.add_movies(processed.iloc[550:])
+    updated.save(model_dir, fingerprint=MovieRecommender.read_manifest(model_dir)['fingerprint'])
+    with pytest.raises(ValueError, match="different batch job"):
+        run_batch(model_dir, output_dir, n=5, movie_ids=movie_ids, shard_size=200)
@@ -0,0 +1,21 @@
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from neighbor_index import NeighborIndex
+
+
+def test_add_rows_matches_a_fresh_build_with_tied_scores():
+    rng = np.random.default_rng(0)
+    base = sparse.random(300, 40, density=0.1, random_state=rng, format='csr')
+    # Duplicate rows tie exactly with each other for every query
+    matrix = normalize(sparse.vstack([base, base[rng.integers(0, 300, 60)]], format='csr'))
+    matrix = matrix[rng.permutation(matrix.shape[0])]
+
+    fresh = NeighborIndex(k=10, block_size=64).build(matrix)
+    incremental = NeighborIndex(k=10, block_size=64).build(matrix[:250])
+    for start in range(250, matrix.shape[0], 37):
+        incremental.add_rows(matrix[:start + 37], start)
+
+    np.testing.assert_array_equal(incremental.indices, fresh.indices)
+    np.testing.assert_allclose(incremental.scores, fresh.scores, rtol=1e-6)
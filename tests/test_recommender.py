@@ -0,0 +1,25 @@
+import pandas as pd
+
+from feature_engineering import genre_bitmask
+from recommender import MovieRecommender
+
+
+def test_add_movies_keeps_compacted_layout(catalog_path, processed, tmp_path):
+    old, new = processed.iloc[:550].reset_index(drop=True), processed.iloc[550:].reset_index(drop=True)
+    MovieRecommender.load_or_build(catalog_path, str(tmp_path / 'model'), df=old, k=10, compact=True)
+    recommender = MovieRecommender.load(str(tmp_path / 'model'))
+    columns, dtypes = list(recommender.df.columns), recommender.df.dtypes
+
+    recommender.add_movies(new)
+
+    assert list(recommender.df.columns) == columns
+    for col in columns:
+        if isinstance(dtypes[col], pd.CategoricalDtype):
+            assert isinstance(recommender.df[col].dtype, pd.CategoricalDtype), col
+        else:
+            assert recommender.df[col].dtype == dtypes[col], col
+    masks = recommender.df['genre_mask']
+    assert masks.notna().all()
+    expected = genre_bitmask(recommender.df['genre_names'], recommender.df.attrs['genre_classes'])
+    assert (masks.to_numpy() == expected).all()
+    assert recommender.df['title'].iloc[550:].tolist() == new['title'].tolist()
@@ -0,0 +1,37 @@
+import pytest
+
+from catalog_filters import CatalogFilter
+from recommender import MovieRecommender
+
+
+@pytest.mark.parametrize('filters', ['en', ['en'], 3])
+def test_normalize_rejects_non_mapping_filters(filters):
+    with pytest.raises(ValueError):
+        CatalogFilter.normalize(filters)
+
+
+def test_normalize_canonical_form():
+    assert CatalogFilter.normalize(None) is None
+    assert CatalogFilter.normalize({}) is None
+    assert CatalogFilter.normalize({'original_language': ['fr', 'en'], 'release_year': [2000, None]}) == (
+        ('original_language', ('en', 'fr')), ('release_year', (2000.0, None))
+    )
+
+
+@pytest.mark.parametrize('ranking, weights', [
+    ('weird', None),
+    ('hybrid', {'unknown': 1}),
+    ('hybrid', {'rating': 'x'}),
+    ('hybrid', {'rating': float('nan')}),
+    ('hybrid', {'rating': float('inf')}),
+    ('hybrid', [1]),
+])
+def test_validate_ranking_rejects_bad_options(processed, ranking, weights):
+    with pytest.raises(ValueError):
+        MovieRecommender(processed).validate_ranking(ranking, weights)
+
+
+def test_validate_ranking_accepts_known_options(processed):
+    recommender = MovieRecommender(processed)
+    recommender.validate_ranking()
+    recommender.validate_ranking('hybrid', {'rating': 0.5})
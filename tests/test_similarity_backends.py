@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from similarity_backends import ApproximateCosineBackend, ExactCosineBackend, evaluate_backend
+
+
+@pytest.fixture(scope='module')
+def backends(processed):
+    matrix = TfidfVectorizer(stop_words='english').fit_transform(processed['combined_features'].fillna(''))
+    return ApproximateCosineBackend().build(matrix), ExactCosineBackend().build(matrix)
+
+
+def test_approximate_recall_rises_with_probes_and_refine(backends):
+    approximate, exact = backends
+    rows = np.arange(0, exact.matrix.shape[0], 5)
+    n_lists = len(approximate.centroids)
+
+    def recall(**options):
+        return evaluate_backend(approximate, exact, rows, k=10, **options)['recall_at_k']
+
+    default = recall()
+    every_list = recall(n_probes=n_lists)
+    assert every_list > default
+    # The exact rescoring pool, not the probes, caps recall once every list is scanned
+    assert recall(n_probes=n_lists, refine=4) < every_list
+    assert every_list >= 0.98
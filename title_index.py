@@ -0,0 +1,262 @@
+import bisect
+import difflib
+from collections import Counter, defaultdict
+
+import pandas as pd
+from row_keys import RowKeys
+
+
+class TitleIndex:
+    def __init__(self, df):
+        """
+        Build hash lookups from title and TMDB id to row position
+
+        Entries hold stable RowKeys keys, so add() and remove() only touch
+        the movies and titles that change instead of rebuilding the index.
+
+        Args:
+            df (pd.DataFrame): Movie catalog with 'title' and optionally
+                'id' and 'release_year' columns
+        """
+        self.keys = RowKeys()
+        self.by_title = defaultdict(list)
+        self.by_id = {}
+        # Every key of an id held by more than one movie, for removals
+        self._id_keys = {}
+        self._titles = []
+        self._years = []
+        self._ids = []
+        self._labels = {}
+        self._title_labels = {}
+
+        new_titles = self._append(df)
+
+        # Sorted normalized titles for prefix search, trigrams for typos
+        self._normalized = defaultdict(list)
+        for title in new_titles:
+            self._normalized[self._normalize(title)].append(title)
+        self._sorted_keys = sorted(self._normalized)
+        self._trigrams = defaultdict(set)
+        for key in self._sorted_keys:
+            for gram in self._grams(key):
+                self._trigrams[gram].add(key)
+
+        for title in self.by_title:
+            self._set_labels(title)
+        self._sorted_labels = sorted(self._labels)
+
+    def _append(self, df):
+        """Key the rows of df as appended to the catalog; returns titles seen for the first time"""
+        titles = df['title'].tolist()
+        years = df['release_year'].tolist() if 'release_year' in df.columns else [None] * len(df)
+        ids = df['id'].tolist() if 'id' in df.columns else [None] * len(df)
+
+        new_titles = []
+        for key, title, year, movie_id in zip(self.keys.append(len(df)).tolist(), titles, years, ids):
+            if title not in self.by_title:
+                new_titles.append(title)
+            self.by_title[title].append(key)
+            self._titles.append(title)
+            self._years.append(int(year) if pd.notna(year) else None)
+            self._ids.append(movie_id)
+            if movie_id is None:
+                continue
+            if movie_id in self.by_id:
+                self._id_keys.setdefault(movie_id, [self.by_id[movie_id]]).append(key)
+            else:
+                self.by_id[movie_id] = key
+        return new_titles
+
+    def add(self, df):
+        """
+        Index movies appended to the end of the catalog
+
+        Args:
+            df (pd.DataFrame): The new rows only, in catalog order
+        """
+        new_titles = self._append(df)
+        for title in new_titles:
+            key = self._normalize(title)
+            if key not in self._normalized:
+                bisect.insort(self._sorted_keys, key)
+                for gram in self._grams(key):
+                    self._trigrams[gram].add(key)
+            self._normalized[key].append(title)
+        for title in dict.fromkeys(df['title'].tolist()):
+            self._relabel(title)
+
+    def remove(self, keep):
+        """
+        Drop movies from the index and renumber the remaining rows
+
+        Args:
+            keep (np.ndarray): Boolean mask over current rows, False for
+                the movies being removed
+        """
+        touched = {}
+        for key in self.keys.remove(keep).tolist():
+            title = self._titles[key]
+            touched[title] = None
+            self.by_title[title].remove(key)
+
+            movie_id = self._ids[key]
+            if movie_id in self._id_keys:
+                others = self._id_keys[movie_id]
+                others.remove(key)
+                self.by_id[movie_id] = others[0]
+                if len(others) == 1:
+                    del self._id_keys[movie_id]
+            elif movie_id is not None:
+                del self.by_id[movie_id]
+
+        for title in touched:
+            if self.by_title[title]:
+                self._relabel(title)
+                continue
+            del self.by_title[title]
+            self._relabel(title)
+            key = self._normalize(title)
+            self._normalized[key].remove(title)
+            if not self._normalized[key]:
+                del self._normalized[key]
+                del self._sorted_keys[bisect.bisect_left(self._sorted_keys, key)]
+                for gram in self._grams(key):
+                    self._trigrams[gram].discard(key)
+                    if not self._trigrams[gram]:
+                        del self._trigrams[gram]
+
+    @staticmethod
+    def _normalize(title):
+        return str(title).casefold().strip()
+
+    @staticmethod
+    def _grams(key):
+        padded = f"  {key} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def lookup(self, title, year=None):
+        """
+        Row position for an exact title
+
+        Args:
+            title (str): Movie title
+            year (int, optional): Release year used to pick between
+                movies sharing the title; defaults to the first match
+
+        Returns:
+            int or None: Row position, or None if not found
+        """
+        keys = self.by_title.get(title)
+        if not keys:
+            return None
+        if year is None:
+            return self.keys.row(keys[0])
+        for key in keys:
+            if self._years[key] == year:
+                return self.keys.row(key)
+        return None
+
+    def lookup_id(self, movie_id):
+        """Row position for a TMDB id, or None if not found"""
+        key = self.by_id.get(movie_id)
+        return None if key is None else self.keys.row(key)
+
+    def rows_for_title(self, title):
+        """All row positions sharing a title, in catalog order"""
+        return [self.keys.row(key) for key in self.by_title.get(title, [])]
+
+    def search_prefix(self, prefix, limit=10):
+        """
+        Titles starting with a prefix, case-insensitive
+
+        Args:
+            prefix (str): Start of the title
+            limit (int): Maximum number of titles returned
+
+        Returns:
+            list: Matching titles in alphabetical order
+        """
+        key = self._normalize(prefix)
+        start = bisect.bisect_left(self._sorted_keys, key)
+        matches = []
+        for normalized in self._sorted_keys[start:]:
+            if not normalized.startswith(key) or len(matches) >= limit:
+                break
+            matches.extend(self._normalized[normalized])
+        return matches[:limit]
+
+    def suggest(self, query, limit=5, cutoff=0.6):
+        """
+        Closest titles to a possibly misspelled query
+
+        Candidates sharing the most character trigrams with the query are
+        scored with difflib, so the catalog is never scanned in full.
+
+        Args:
+            query (str): Title as typed by the user
+            limit (int): Maximum number of suggestions
+            cutoff (float): Minimum similarity ratio between 0 and 1
+
+        Returns:
+            list: Suggested titles, best match first
+        """
+        key = self._normalize(query)
+        hits = Counter()
+        for gram in self._grams(key):
+            hits.update(self._trigrams.get(gram, ()))
+
+        scored = []
+        for candidate, _ in hits.most_common(limit * 10):
+            ratio = difflib.SequenceMatcher(None, key, candidate).ratio()
+            if ratio >= cutoff:
+                scored.append((-ratio, candidate))
+
+        suggestions = []
+        for _, candidate in sorted(scored):
+            suggestions.extend(self._normalized[candidate])
+        return suggestions[:limit]
+
+    def _set_labels(self, title):
+        """Display labels for one title, with the release year added to duplicates"""
+        keys = self.by_title.get(title, [])
+        if len(keys) == 1:
+            candidates = [(str(title), keys[0])]
+        else:
+            candidates = []
+            seen = Counter()
+            for key in keys:
+                year = self._years[key] if self._years[key] is not None else 'unknown year'
+                label = f"{title} ({year})"
+                seen[label] += 1
+                if seen[label] > 1:
+                    label = f"{label} #{seen[label]}"
+                candidates.append((label, key))
+
+        labels = []
+        for label, key in candidates:
+            # Another title can already render the same text, e.g. "Heat (1995)"
+            if label in self._labels:
+                label = f"{label} [{self._ids[key]}]"
+            self._labels[label] = key
+            labels.append(label)
+        self._title_labels[title] = labels
+        return labels
+
+    def _relabel(self, title):
+        """Recompute the labels of one title after its movies changed"""
+        for label in self._title_labels.pop(title, []):
+            del self._labels[label]
+            del self._sorted_labels[bisect.bisect_left(self._sorted_labels, label)]
+        for label in self._set_labels(title):
+            bisect.insort(self._sorted_labels, label)
+        if not self._title_labels[title]:
+            del self._title_labels[title]
+
+    def labels(self):
+        """Sorted display labels, one per movie"""
+        return self._sorted_labels
+
+    def lookup_label(self, label):
+        """Row position for a label returned by labels()"""
+        key = self._labels.get(label)
+        return None if key is None else self.keys.row(key)